@@ -0,0 +1,119 @@
+"""
+pragma_parsing.py
+
+Measure how many pragmas per second pytmc can parse. Every pytmc pragma in
+the .tmc fixtures of the test suite is parsed with the single-pass tokenizer
+and with the original three-pass parser, which is reproduced below.
+
+Run from the repository root with pytmc installed:
+
+    python benchmarks/pragma_parsing.py
+"""
+import argparse
+import glob
+import os
+import re
+import timeit
+import xml.etree.ElementTree as ET
+
+from pytmc.xml_obj import _tokenize_pragma
+
+
+def legacy_parse(raw_config):
+    """
+    Parse a pragma the way Configuration did before the tokenizer: split it
+    into lines, split the lines into title and tag, then split the field tags.
+    Each step compiles its own regular expression.
+    """
+    line_term_seqs = [r";",r";;",r"[\n\r]",r"$"]
+    flex_term_regex = "|".join(line_term_seqs)
+    line_finder = re.compile(
+        r"(?P<line>.+?)(?P<delim>"+flex_term_regex+")"
+    )
+    conf_lines = [m.groupdict() for m in line_finder.finditer(raw_config)]
+    result_no_delims = [r["line"] for r in conf_lines]
+    result_no_delims = [
+        x for x in result_no_delims if x.strip() != ''
+    ]
+    line_parser = re.compile(
+        r"(?P<title>[\S]+):(?:[^\S]*)(?P<tag>.*)"
+    )
+    result = [
+        line_parser.search(m).groupdict() for m in result_no_delims
+    ]
+    for line in result:
+        line['tag'] = line['tag'].strip()
+
+    for line in result:
+        if line['title'] == 'field':
+            finder = re.compile(
+                r"(?P<f_name>[\S]+)(?:[^\S]*)(?P<f_set>.*)"
+            )
+            line['tag'] = finder.search(line['tag']).groupdict()
+    return result
+
+
+def tokenizer_parse(raw_config):
+    """
+    Parse a pragma with the single-pass tokenizer into the same structure as
+    :func:`~legacy_parse`
+    """
+    result = []
+    for title, tag in _tokenize_pragma(raw_config):
+        if title == 'field':
+            tag = {'f_name': tag[0], 'f_set': tag[1]}
+        result.append({'title': title, 'tag': tag})
+    return result
+
+
+def collect_pragmas(directory):
+    """
+    Gather the text of every pytmc pragma in the .tmc files of a directory
+    """
+    pragmas = []
+    for filename in sorted(glob.glob(os.path.join(directory, '*.tmc'))):
+        root = ET.parse(filename).getroot()
+        for prop in root.iter('Property'):
+            if prop.findtext('./Name') == 'pytmc':
+                value = prop.findtext('./Value')
+                if value is not None:
+                    pragmas.append(value)
+    return pragmas
+
+
+def main():
+    default_dir = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)), os.pardir, 'tests'
+    )
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument(
+        '--fixtures', default=default_dir,
+        help='Directory holding the .tmc files to take pragmas from'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=5,
+        help='Number of timing runs, the best is reported'
+    )
+    args = parser.parse_args()
+
+    pragmas = collect_pragmas(args.fixtures)
+    print('{} pragmas from {}'.format(len(pragmas), args.fixtures))
+    for raw_config in pragmas:
+        assert tokenizer_parse(raw_config) == legacy_parse(raw_config)
+
+    rates = {}
+    for name, func in (('legacy', legacy_parse),
+                       ('tokenizer', tokenizer_parse)):
+        def run():
+            for raw_config in pragmas:
+                func(raw_config)
+        number = max(1, 20000 // max(1, len(pragmas)))
+        best = min(timeit.repeat(run, number=number, repeat=args.repeat))
+        rates[name] = number * len(pragmas) / best
+        print('{:>10}: {:12.0f} pragmas/s'.format(name, rates[name]))
+
+    print('   speedup: {:12.2f}x'.format(rates['tokenizer'] / rates['legacy']))
+
+
+if __name__ == '__main__':
+    main()
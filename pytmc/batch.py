@@ -0,0 +1,326 @@
+"""
+batch.py
+
+This file contains the columnar alternative to running
+:func:`~pytmc.xml_collector.BaseRecordPackage.guess_all` on each record
+package. The attributes of all packages are laid out in columns and the
+guesses are made for every package at once with NumPy. Requires numpy.
+"""
+import logging
+logger = logging.getLogger(__name__)
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .beckhoff import epics_support, epics_types, io_direction
+
+
+# Order in which BaseRecordPackage applies its guesses. The columns are
+# written back in this order so the configuration lines match guess_all.
+GUESS_ORDER = (
+    'guess_common',
+    'guess_io',
+    'guess_type',
+    'guess_DTYP',
+    'guess_INP_OUT',
+    'guess_SCAN',
+    'guess_OZ_NAM',
+    'guess_PREC',
+    'guess_FTVL',
+    'guess_NELM',
+)
+
+# Index of each io direction in the lookup tables
+_io_codes = {'io': 0, 'i': 1, 'o': 2, None: 3}
+
+# Configuration lines and fields whose presence decides whether a guess is
+# made. A package holding more than one of any of these is guessed on its own.
+_counted_lines = ('io', 'type')
+_counted_fields = frozenset((
+    'PINI', 'TSE', 'DTYP', 'INP', 'OUT', '', 'SCAN', 'ONAM', 'ZNAM', 'PREC',
+    'FTVL', 'NELM',
+))
+
+# INP or OUT field written for each io direction, see
+# BaseRecordPackage.INP_OUT_setting. Indexed like the inp_out column of
+# _guess_batch and by _io_codes respectively.
+_inp_out_fields = ('', 'INP', 'OUT')
+_assign_symbols = ('?', '?', '=', '')
+_inp_out_template = '"@asyn($(PORT),0,1)ADSPORT={port}/{name}{symbol}"'
+
+_tables = None
+
+
+class _Tables:
+    """
+    Lookup tables built from :data:`~pytmc.beckhoff.epics_types`. Values are
+    stored as codes into :attr:`~values`, code 0 being None.
+    """
+    def __init__(self):
+        self.tc_types = list(epics_support)
+        self.tc_codes = {
+            tc_type: code for code, tc_type in enumerate(self.tc_types)
+        }
+        self.values = [None]
+        value_codes = {None: 0}
+
+        shape = (len(self.tc_types) + 1, 2, len(_io_codes))
+        self.record_type = np.zeros(shape, dtype=np.intp)
+        self.DTYP = np.zeros(shape, dtype=np.intp)
+        self.FTVL = np.zeros(shape, dtype=np.intp)
+        self.SCAN = np.zeros(shape, dtype=np.intp)
+        for tc_code, tc_type in enumerate(self.tc_types + [None]):
+            for is_array in (False, True):
+                for io, io_code in _io_codes.items():
+                    epics_type = epics_types[(tc_type, is_array, io)]
+                    for table, value in ((self.record_type,
+                                          epics_type.record_type),
+                                         (self.DTYP, epics_type.DTYP),
+                                         (self.FTVL, epics_type.FTVL),
+                                         (self.SCAN, epics_type.SCAN)):
+                        if value not in value_codes:
+                            value_codes[value] = len(self.values)
+                            self.values.append(value)
+                        table[tc_code, int(is_array), io_code] = (
+                            value_codes[value]
+                        )
+
+        self.float_types = np.array([
+            value_codes.get('ai', -1), value_codes.get('ao', -1)
+        ])
+        self.bool_code = self.tc_codes['BOOL']
+
+    def tc_code(self, tc_type):
+        return self.tc_codes.get(tc_type, len(self.tc_types))
+
+
+def _get_tables():
+    global _tables
+    if _tables is None:
+        _tables = _Tables()
+    return _tables
+
+
+def guess_packages(packages):
+    """
+    Add the guessed configuration lines to each package, giving the same
+    result as calling :func:`~pytmc.xml_collector.BaseRecordPackage.guess_all`
+    on every package. Packages must already hold their naive configuration.
+
+    Packages of other classes than BaseRecordPackage, or whose configuration
+    repeats one of the lines the guesses depend on, are guessed one by one
+    with their own guess_all.
+
+    Parameters
+    ----------
+    packages : list
+        :class:`~pytmc.xml_collector.BaseRecordPackage` instances
+
+    Returns
+    -------
+    collections.Counter
+        The number of packages each guessing method changed, keyed by method
+        name
+
+    Raises
+    ------
+    ImportError
+        If numpy is not installed
+    """
+    if np is None:
+        raise ImportError("Batch guessing requires numpy")
+    from .xml_collector import BaseRecordPackage
+
+    fired = Counter()
+    order = tuple(
+        rule.method for rule in BaseRecordPackage.ordered_guess_rules()
+    )
+    batch = []
+    for pack in packages:
+        if type(pack) is BaseRecordPackage and order == GUESS_ORDER:
+            row = _package_row(pack)
+            if row is not None:
+                batch.append(row)
+                continue
+        fired.update(pack.guess_all())
+
+    if batch:
+        fired.update(_guess_batch(batch))
+    return fired
+
+
+def _package_row(pack):
+    """
+    Gather what the guesses depend on for a single package in one pass over
+    its configuration: the package, the number of each counted line and
+    field, the tag of the io line, the tag of the type line and the last
+    element of the chain. Returns None if the package holds more than one of
+    a counted line or field.
+    """
+    counts = dict.fromkeys(_counted_lines, 0)
+    counts.update(dict.fromkeys(_counted_fields, 0))
+    io = 'io'
+    type_tag = None
+    for line in pack.cfg.config:
+        title = line['title']
+        if title == 'field':
+            key = line['tag']['f_name']
+            if key not in _counted_fields:
+                continue
+        elif title == 'io':
+            key = title
+            io = line['tag']
+        elif title == 'type':
+            key = title
+            type_tag = line['tag']
+        else:
+            continue
+        if counts[key]:
+            return None
+        counts[key] = 1
+
+    return pack, counts, io, type_tag, pack.chain.last
+
+
+def _field(f_name, f_set):
+    return {'title': 'field', 'tag': {'f_name': f_name, 'f_set': f_set}}
+
+
+def _guess_batch(batch):
+    """
+    Make the guesses for regular packages column by column, then append the
+    guessed lines to each package in the order of :data:`GUESS_ORDER`.
+    """
+    tables = _get_tables()
+    size = len(batch)
+
+    def column(values, dtype=bool):
+        return np.fromiter(values, dtype=dtype, count=size)
+
+    def has(key):
+        return column(row[1][key] for row in batch)
+
+    lasts = [row[4] for row in batch]
+    tc = column((tables.tc_code(last.tc_type) for last in lasts), np.intp)
+    io = column((_io_codes[io_direction(row[2])] for row in batch), np.intp)
+    is_array = column(bool(last.is_array) for last in lasts)
+    is_str = column(bool(last.is_str) for last in lasts)
+    array_idx = is_array.astype(np.intp)
+
+    # guess_common and guess_io
+    need_common = ~(has('PINI') & has('TSE'))
+    need_io = ~has('io')
+
+    # guess_type
+    has_type = has('type')
+    record_type = tables.record_type[tc, array_idx, io]
+    need_type = ~has_type & (record_type != 0)
+
+    # guess_DTYP
+    dtyp = tables.DTYP[tc, array_idx, io]
+    need_dtyp = ~has('DTYP') & (dtyp != 0)
+
+    # guess_INP_OUT
+    no_io = io == _io_codes[None]
+    is_inp = (io == _io_codes['i']) | (~no_io & (is_array | is_str))
+    has_inp_out = np.where(
+        no_io, has(''), np.where(is_inp, has('INP'), has('OUT'))
+    )
+    need_inp_out = ~has_inp_out
+    inp_out = np.where(no_io, 0, np.where(is_inp, 1, 2))
+
+    # guess_SCAN
+    scan = tables.SCAN[tc, array_idx, io]
+    need_scan = ~has('SCAN') & (scan != 0)
+    need_info = need_scan & (io == _io_codes['io'])
+
+    # guess_OZ_NAM
+    is_bool = tc == tables.bool_code
+    need_onam = is_bool & ~has('ONAM')
+    need_znam = is_bool & ~has('ZNAM')
+
+    # guess_PREC
+    type_is_float = column(row[3] in ('ai', 'ao') for row in batch)
+    guessed_float = np.isin(record_type, tables.float_types)
+    need_prec = ~has('PREC') & np.where(
+        has_type, type_is_float, need_type & guessed_float
+    )
+
+    # guess_FTVL
+    ftvl = tables.FTVL[tc, array_idx, _io_codes[None]]
+    need_ftvl = ~has('FTVL') & ((ftvl != 0) | is_str)
+
+    # guess_NELM
+    need_nelm = ~has('NELM') & (is_array | is_str)
+
+    values = tables.values
+    columns = zip(
+        batch,
+        io.tolist(),
+        need_common.tolist(),
+        need_io.tolist(),
+        np.where(need_type, record_type, 0).tolist(),
+        np.where(need_dtyp, dtyp, 0).tolist(),
+        np.where(need_inp_out, inp_out, -1).tolist(),
+        np.where(need_scan, scan, 0).tolist(),
+        need_info.tolist(),
+        need_onam.tolist(),
+        need_znam.tolist(),
+        need_prec.tolist(),
+        np.where(need_ftvl, ftvl, -1).tolist(),
+        need_nelm.tolist(),
+    )
+    for (row, io_code, common, add_io, type_code, dtyp_code, inp_out_code,
+            scan_code, info, onam, znam, prec, ftvl_code, nelm) in columns:
+        pack = row[0]
+        config = pack.cfg.config
+        if common:
+            config.append(_field("PINI", '"1"'))
+            config.append(_field("TSE", "-2"))
+        if add_io:
+            config.append({'title': 'io', 'tag': 'io'})
+        if type_code:
+            config.append({'title': 'type', 'tag': values[type_code]})
+        if dtyp_code:
+            config.append(_field("DTYP", values[dtyp_code]))
+        if inp_out_code >= 0:
+            config.append(_field(
+                _inp_out_fields[inp_out_code],
+                _inp_out_template.format(
+                    port=pack.ads_port,
+                    name='.'.join(element.name for element in pack.chain.chain),
+                    symbol=_assign_symbols[io_code],
+                ),
+            ))
+        if scan_code:
+            config.append(_field("SCAN", values[scan_code]))
+            if info:
+                config.append({'title': 'info', 'tag': True})
+        if onam:
+            config.append(_field("ONAM", "One"))
+        if znam:
+            config.append(_field("ZNAM", "Zero"))
+        if prec:
+            config.append(_field("PREC", '"3"'))
+        if ftvl_code > 0:
+            config.append(_field("FTVL", values[ftvl_code]))
+        elif ftvl_code == 0:
+            config.append(_field("FTVL", '"CHAR"'))
+        if nelm:
+            config.append(_field("NELM", row[4].iterable_length))
+
+    return Counter({
+        'guess_common': int(need_common.sum()),
+        'guess_io': int(need_io.sum()),
+        'guess_type': int(need_type.sum()),
+        'guess_DTYP': int(need_dtyp.sum()),
+        'guess_INP_OUT': int(need_inp_out.sum()),
+        'guess_SCAN': int(need_scan.sum()),
+        'guess_OZ_NAM': int((need_onam | need_znam).sum()),
+        'guess_PREC': int(need_prec.sum()),
+        'guess_FTVL': int(need_ftvl.sum()),
+        'guess_NELM': int(need_nelm.sum()),
+    })
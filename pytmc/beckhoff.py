@@ -1,4 +1,5 @@
 import logging
+from collections import namedtuple
 logger = logging.getLogger(__name__)
 
 
@@ -25,3 +26,151 @@ beckhoff_types = [
     "DATE_AND_TIME",
     "DT", #unclear if this is the xml abbreviation for DATE_AND_TIME
 ]
+
+
+# How each type is supported in EPICS, as (record kind, asyn interface of a
+# scalar, asyn interface prefix of an array, waveform FTVL). The record kind
+# is 'binary' (bi/bo), 'analog' (ai/ao) or 'string' (waveform). ENUM is used
+# by pytmc for enumerated types.
+epics_support = {
+    "BOOL": ('binary', 'asynInt32', 'asynInt8Array', 'CHAR'),
+    "BYTE": ('analog', 'asynInt32', 'asynInt8Array', 'UCHAR'),
+    "WORD": ('analog', 'asynInt32', 'asynInt16Array', 'USHORT'),
+    "DWORD": ('analog', 'asynInt32', 'asynInt32Array', 'ULONG'),
+    "SINT": ('analog', 'asynInt32', 'asynInt8Array', 'CHAR'),
+    "USINT": ('analog', 'asynInt32', 'asynInt8Array', 'UCHAR'),
+    "INT": ('analog', 'asynInt32', 'asynInt16Array', 'SHORT'),
+    "UINT": ('analog', 'asynInt32', 'asynInt16Array', 'USHORT'),
+    "DINT": ('analog', 'asynInt32', 'asynInt32Array', 'LONG'),
+    "UDINT": ('analog', 'asynInt32', 'asynInt32Array', 'ULONG'),
+    "LINT": ('analog', 'asynInt64', 'asynInt64Array', 'INT64'),
+    "ULINT": ('analog', 'asynInt64', 'asynInt64Array', 'UINT64'),
+    "REAL": ('analog', 'asynFloat32', 'asynFloat32Array', 'FLOAT'),
+    "LREAL": ('analog', 'asynFloat64', 'asynFloat64Array', 'DOUBLE'),
+    "STRING": ('string', None, 'asynInt8Array', None),
+    "TIME": ('analog', 'asynInt32', 'asynInt32Array', 'ULONG'),
+    "TIME_OF_DAY": ('analog', 'asynInt32', 'asynInt32Array', 'ULONG'),
+    "TOD": ('analog', 'asynInt32', 'asynInt32Array', 'ULONG'),
+    "DATE": ('analog', 'asynInt32', 'asynInt32Array', 'ULONG'),
+    "DATE_AND_TIME": ('analog', 'asynInt32', 'asynInt32Array', 'ULONG'),
+    "DT": ('analog', 'asynInt32', 'asynInt32Array', 'ULONG'),
+    "ENUM": ('analog', 'asynInt32', 'asynInt16Array', 'SHORT'),
+}
+
+
+EpicsType = namedtuple('EpicsType', ['record_type', 'DTYP', 'FTVL', 'SCAN'])
+
+
+def io_direction(io):
+    """
+    Reduce the tag of an io line to the direction used by
+    :data:`epics_types`
+
+    Parameters
+    ----------
+    io : str
+        Tag of the io configuration line, e.g. 'i', 'o', 'io' or 'input'
+
+    Returns
+    -------
+    str or None
+        'io', 'i' or 'o'. None if the tag contains neither 'i' nor 'o'.
+    """
+    if 'i' in io and 'o' in io:
+        return 'io'
+    elif 'i' in io:
+        return 'i'
+    elif 'o' in io:
+        return 'o'
+    return None
+
+
+def _quote(value):
+    if value is None:
+        return None
+    return '"{}"'.format(value)
+
+
+def _build_epics_type(tc_type, is_array, io):
+    """
+    Work out the EpicsType for one key of :data:`epics_types`. A tc_type of
+    None stands for any type missing from :data:`epics_support`.
+    """
+    kind, dtyp, array_dtyp, ftvl = epics_support.get(
+        tc_type, (None, None, None, None)
+    )
+    if io is None:
+        array_suffix = None
+    elif 'o' in io:
+        array_suffix = 'Out'
+    else:
+        array_suffix = 'In'
+
+    # Arrays and strings are waveforms
+    if io is None:
+        record_type = None
+    elif is_array or kind == 'string':
+        record_type = 'waveform'
+    elif kind == 'binary':
+        record_type = 'bo' if 'o' in io else 'bi'
+    elif kind == 'analog':
+        record_type = 'ao' if 'o' in io else 'ai'
+    else:
+        record_type = None
+
+    if (is_array or kind == 'string') and array_dtyp is not None:
+        DTYP = None if array_suffix is None else array_dtyp + array_suffix
+    else:
+        DTYP = dtyp
+
+    if io == 'i':
+        SCAN = 'I/O Intr' if kind == 'binary' else '.5 second'
+    elif io is not None:
+        SCAN = 'Passive'
+    else:
+        SCAN = None
+
+    return EpicsType(
+        record_type=record_type,
+        DTYP=_quote(DTYP),
+        FTVL=_quote(ftvl) if is_array else None,
+        SCAN=_quote(SCAN),
+    )
+
+
+# Precomputed EpicsType for every (tc_type, is_array, io direction)
+epics_types = {
+    (tc_type, is_array, io): _build_epics_type(tc_type, is_array, io)
+    for tc_type in list(epics_support) + [None]
+    for is_array in (False, True)
+    for io in ('io', 'i', 'o', None)
+}
+
+
+def lookup_epics_type(tc_type, is_array, io):
+    """
+    Find the record type, DTYP, FTVL and SCAN for a variable
+
+    Parameters
+    ----------
+    tc_type : str
+        The TwinCAT type of the variable
+
+    is_array : bool
+        Whether the variable is an array
+
+    io : str or None
+        Tag of the io configuration line, None if there is none
+
+    Returns
+    -------
+    EpicsType
+        Fields that can't be determined are None. The DTYP, FTVL and SCAN
+        are quoted as they appear in the db file.
+    """
+    if io is not None:
+        io = io_direction(io)
+    try:
+        return epics_types[(tc_type, bool(is_array), io)]
+    except KeyError:
+        return epics_types[(None, bool(is_array), io)]
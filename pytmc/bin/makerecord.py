@@ -3,26 +3,385 @@ logger = logging.getLogger(__name__)
 
 import pytmc
 import argparse
-from .. import TmcFile
+import os
+import shlex
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from .. import TmcFile, incremental
+from ..output import write_if_changed
+from ..xml_collector import get_template, use_template_cache
+
+
+def make_record(tmc_path, record_path, stream=False, lazy=False,
+                cache_dir=None, workers=None, use_sidecar=False,
+                previous=None, batch=False, templates=None):
+    """
+    Generate the .db file of a single .tmc file
+
+    Parameters
+    ----------
+    tmc_path : str
+        Path to interpreted .tmc file
+
+    record_path : str
+        Path to output .db file
+
+    stream, lazy, cache_dir : optional
+        See :class:`~pytmc.xml_collector.TmcFile`
+
+    workers, batch : optional
+        See :func:`~pytmc.xml_collector.TmcFile.configure_packages`
+
+    use_sidecar : bool, optional
+        Only regenerate the records of changed symbols, see
+        :mod:`~pytmc.incremental`. The previous build is read from and
+        written to the sidecar file next to record_path.
+
+    previous : dict, optional
+        The previous build, as returned by this function. Only the records of
+        changed symbols are regenerated. Takes the place of the sidecar file
+        when reading.
+
+    templates : collections.OrderedDict, optional
+        Leaf templates shared with earlier builds, see
+        :attr:`~pytmc.xml_collector.TmcFile.shared_templates`
+
+    Returns
+    -------
+    tuple
+        Whether the .db file changed, see
+        :func:`~pytmc.output.write_if_changed`, and, if use_sidecar or
+        previous is given, the hashes and records of this build in the form
+        of :func:`~pytmc.incremental.load_sidecar`, otherwise None
+    """
+    with open(tmc_path) as tmc_file:
+        tmc_obj = pytmc.TmcFile(
+            tmc_file, stream=stream, lazy=lazy, cache_dir=cache_dir
+        )
+    tmc_obj.free_tree()
+    tmc_obj.shared_templates = templates
+    result = None
+    if use_sidecar or previous is not None:
+        sidecar = incremental.sidecar_path(record_path)
+        if previous is None:
+            previous = incremental.load_sidecar(sidecar)
+        hashes, records, changed = incremental.regenerate(
+            tmc_obj, previous, workers=workers, batch=batch
+        )
+        logger.info("Regenerated {} of {} symbols".format(
+            len(changed), len(hashes)
+        ))
+        changed_output = write_if_changed(
+            record_path,
+            lambda record_file: tmc_obj.render_to(
+                record_file, records=chain.from_iterable(records.values())
+            ),
+        )
+        if use_sidecar:
+            incremental.store_sidecar(sidecar, hashes, records)
+        result = {name: (hashes[name], records[name]) for name in hashes}
+    else:
+        tmc_obj.create_chains(prune=True)
+        tmc_obj.isolate_chains()
+        tmc_obj.create_packages()
+        tmc_obj.configure_packages(workers=workers, batch=batch)
+        changed_output = write_if_changed(
+            record_path,
+            lambda record_file: tmc_obj.render_to(
+                record_file, workers=workers
+            ),
+        )
+    return changed_output, result
+
+
+def describe_change(changed):
+    """
+    Word used to report the outcome of :func:`~make_record`
+    """
+    return 'changed' if changed else 'unchanged'
+
+
+def file_signature(path):
+    """
+    Modification time and size of a file, or None if it can't be read
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def watch(tmc_path, record_path, poll_interval=0.5, debounce=0.5,
+          max_builds=None, output=None, **options):
+    """
+    Regenerate the .db file each time the .tmc file changes, starting with
+    a first build straight away. The file is polled, and a change is only
+    acted upon once the file has stayed the same for the debounce time, so
+    a project being rewritten is read once it is complete. Each build
+    reuses the records of the unchanged symbols of the previous one, the
+    leaf templates of the DataTypes that did not change, see
+    :attr:`~pytmc.xml_collector.TmcFile.shared_templates`, and the other
+    caches of this process. A failed build is reported and the file watched
+    again.
+
+    Parameters
+    ----------
+    tmc_path : str
+        Path to interpreted .tmc file
+
+    record_path : str
+        Path to output .db file
+
+    poll_interval : float, optional
+        Seconds between checks of the .tmc file
+
+    debounce : float, optional
+        Seconds the .tmc file must stay unchanged before a build
+
+    max_builds : int, optional
+        Return after this many builds. Defaults to watching forever.
+
+    output : file-like, optional
+        Where to report each build. Defaults to sys.stdout.
+
+    options : optional
+        Passed to :func:`~make_record`
+    """
+    if output is None:
+        output = sys.stdout
+    previous = {}
+    if options.get('use_sidecar'):
+        previous = incremental.load_sidecar(
+            incremental.sidecar_path(record_path)
+        )
+    templates = OrderedDict()
+    built_signature = None
+    builds = 0
+    while max_builds is None or builds < max_builds:
+        signature = file_signature(tmc_path)
+        if signature is None or signature == built_signature:
+            time.sleep(poll_interval)
+            continue
+
+        time.sleep(debounce)
+        if file_signature(tmc_path) != signature:
+            continue
+
+        built_signature = signature
+        builds += 1
+        start = time.perf_counter()
+        try:
+            changed, previous = make_record(
+                tmc_path, record_path, previous=previous,
+                templates=templates, **options
+            )
+        except Exception as e:
+            logger.debug("Failed on " + tmc_path, exc_info=True)
+            output.write("FAILED {:8.2f}s  {}: {}: {}\n".format(
+                time.perf_counter() - start, tmc_path, type(e).__name__, e
+            ))
+        else:
+            output.write("ok     {:8.2f}s  {} -> {} ({})\n".format(
+                time.perf_counter() - start, tmc_path, record_path,
+                describe_change(changed)
+            ))
+        output.flush()
+
+
+def read_manifest(manifest_path):
+    """
+    Read the input/output pairs listed in a manifest file. Each line holds
+    the path of a .tmc file and the path of its .db file, separated by
+    whitespace and quoted like a shell command line if needed. Blank lines
+    and lines starting with '#' are skipped. Relative paths are relative to
+    the directory of the manifest.
+
+    Parameters
+    ----------
+    manifest_path : str
+
+    Returns
+    -------
+    list
+        (tmc_path, record_path) tuples
+    """
+    base = os.path.dirname(manifest_path)
+    pairs = []
+    with open(manifest_path, 'r') as manifest:
+        for line_number, line in enumerate(manifest, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            paths = shlex.split(line)
+            if len(paths) != 2:
+                raise ValueError(
+                    "{}:{}: expected INPUT OUTPUT, found {!r}".format(
+                        manifest_path, line_number, line
+                    )
+                )
+            pairs.append(tuple(os.path.join(base, path) for path in paths))
+    return pairs
+
+
+def _init_worker(log_level, cache_dir):
+    """
+    Prepare a batch worker process once, so every file it handles reuses the
+    logging setup and the loaded templates.
+    """
+    logging.getLogger('pytmc').setLevel(log_level)
+    if cache_dir is not None:
+        use_template_cache(cache_dir)
+    get_template("asyn_standard_file.jinja2")
+    get_template("asyn_standard_record.jinja2")
+
+
+def _run_job(tmc_path, record_path, options):
+    """
+    Run :func:`~make_record` for one pair in a batch, catching any error
+
+    Returns
+    -------
+    tuple
+        Seconds spent, whether the .db file changed and the error message,
+        None on success
+    """
+    start = time.perf_counter()
+    changed = False
+    try:
+        changed, _ = make_record(tmc_path, record_path, **options)
+        error = None
+    except Exception as e:
+        logger.debug("Failed on " + tmc_path, exc_info=True)
+        error = "{}: {}".format(type(e).__name__, e)
+    return time.perf_counter() - start, changed, error
+
+
+def run_batch(pairs, workers=None, log_level=30, **options):
+    """
+    Generate the .db files of many .tmc files in a pool of processes. A
+    failure on one file does not stop the others.
+
+    Parameters
+    ----------
+    pairs : list
+        (tmc_path, record_path) tuples
+
+    workers : int, optional
+        Number of processes. Defaults to the number of CPUs.
+
+    log_level : int, optional
+        Logging level of the worker processes
+
+    options : optional
+        Passed to :func:`~make_record` for every file
+
+    Returns
+    -------
+    list
+        (tmc_path, record_path, seconds, changed, error) tuples in the order
+        of pairs, error being None on success
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(pairs)))
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(log_level, options.get('cache_dir'))) as executor:
+        futures = [
+            executor.submit(_run_job, tmc_path, record_path, options)
+            for tmc_path, record_path in pairs
+        ]
+        results = []
+        for (tmc_path, record_path), future in zip(pairs, futures):
+            seconds, changed, error = future.result()
+            results.append((tmc_path, record_path, seconds, changed, error))
+    return results
+
+
+def report_batch(results, stream=None):
+    """
+    Print the outcome and timing of each file of :func:`~run_batch`
+
+    Parameters
+    ----------
+    results : list
+        Output of :func:`~run_batch`
+
+    stream : file-like, optional
+        Where to print. Defaults to sys.stdout.
+
+    Returns
+    -------
+    int
+        Number of failed files
+    """
+    if stream is None:
+        stream = sys.stdout
+    failures = 0
+    for tmc_path, record_path, seconds, changed, error in results:
+        if error is None:
+            stream.write("ok     {:8.2f}s  {} -> {} ({})\n".format(
+                seconds, tmc_path, record_path, describe_change(changed)
+            ))
+        else:
+            failures += 1
+            stream.write("FAILED {:8.2f}s  {}: {}\n".format(
+                seconds, tmc_path, error
+            ))
+    stream.write("{} files, {} changed, {} failed, {:.2f}s total\n".format(
+        len(results),
+        sum(1 for result in results if result[3]),
+        failures,
+        sum(result[2] for result in results),
+    ))
+    return failures
 
 
 def main():
     description = """\
     "pytmc" is a command line utility for generating epics records files from
     TwinCAT3 .tmc files. This program is designed to work in conjunction with
-    ESSS' m-epics-twincat-ads driver."""
-    
+    ESSS' m-epics-twincat-ads driver.
+
+    Several files can be processed at once by giving --pair or --manifest,
+    in which case they are spread over a pool of processes and a report is
+    printed at the end."""
+
     parser = argparse.ArgumentParser(
         description = description,
         formatter_class = argparse.RawTextHelpFormatter
     )
-    
+
+    parser.add_argument(
+        'tmc_file', metavar="INPUT", type=str, nargs='?',
+        help='Path to interpreted .tmc file'
+    )
+
+    parser.add_argument(
+        'record_file', metavar="OUTPUT", type=str, nargs='?',
+        help='Path to output .db file'
+    )
+
     parser.add_argument(
-        'tmc_file', metavar="INPUT", type=str, help='Path to interpreted .tmc file'
+        '--pair',
+        metavar=("INPUT", "OUTPUT"),
+        nargs=2,
+        action='append',
+        default=[],
+        help='Another .tmc file and its .db file. May be repeated'
     )
-    
+
     parser.add_argument(
-        'record_file', metavar="OUTPUT", type=str, help='Path to output .db file'
+        '--manifest',
+        metavar="MANIFEST",
+        default=None,
+        type=str,
+        help='File listing one "INPUT OUTPUT" pair per line'
     )
 
     parser.add_argument(
@@ -33,22 +392,127 @@ def main():
         type=int,
         help='Python numeric logging level (e.g. 10 for DEBUG, 20 for INFO'
     )
-    
+
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Read the .tmc file incrementally to reduce memory use'
+    )
+
+    parser.add_argument(
+        '--lazy',
+        action='store_true',
+        help='Only load the DataTypes used by the symbols in the .tmc file'
+    )
+
+    parser.add_argument(
+        '--cache-dir',
+        metavar="CACHE_DIR",
+        default=None,
+        type=str,
+        help='Directory used to cache compiled templates and the contents of\n'
+        'unchanged .tmc files between runs'
+    )
+
+    parser.add_argument(
+        '--workers',
+        '-j',
+        metavar="WORKERS",
+        default=None,
+        type=int,
+        help='Number of processes used to configure and render the records.\n'
+        'With several files, the number of files processed at once\n'
+        '(defaults to the number of CPUs)'
+    )
+
+    parser.add_argument(
+        '--batch-guess',
+        action='store_true',
+        help='Guess the configuration of all records at once with NumPy,\n'
+        'see pytmc.batch. Requires numpy'
+    )
+
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only regenerate the records of symbols changed since the last\n'
+        'run, reusing the others from a sidecar file next to OUTPUT'
+    )
+
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running and regenerate OUTPUT whenever INPUT changes'
+    )
+
+    parser.add_argument(
+        '--poll-interval',
+        metavar="SECONDS",
+        default=0.5,
+        type=float,
+        help='How often --watch checks INPUT for changes'
+    )
+
+    parser.add_argument(
+        '--debounce',
+        metavar="SECONDS",
+        default=0.5,
+        type=float,
+        help='How long INPUT must stay unchanged before --watch rebuilds'
+    )
+
     args = parser.parse_args()
+    if (args.tmc_file is None) != (args.record_file is None):
+        parser.error("INPUT and OUTPUT must be given together")
+
+    pairs = []
+    if args.tmc_file is not None:
+        pairs.append((args.tmc_file, args.record_file))
+    pairs.extend(tuple(pair) for pair in args.pair)
+    if args.manifest is not None:
+        pairs.extend(read_manifest(args.manifest))
+    if not pairs:
+        parser.error("no INPUT and OUTPUT, --pair or --manifest given")
+
     pytmc_logger = logging.getLogger('pytmc')
     pytmc_logger.setLevel(args.log)
-    tmc_file = open(args.tmc_file,'r')
-    tmc_obj = pytmc.TmcFile(tmc_file)
-    tmc_obj.create_chains()
-    tmc_obj.isolate_chains()
-    tmc_obj.create_packages()
-    tmc_obj.configure_packages()
-    db_string = tmc_obj.render()
-    record_file = open(args.record_file,'w')
-    record_file.write(db_string)
-    tmc_file.close()
-    record_file.close()
+    options = dict(
+        stream=args.stream,
+        lazy=args.lazy,
+        cache_dir=args.cache_dir,
+        use_sidecar=args.incremental,
+        batch=args.batch_guess,
+    )
 
-if __name__ == '__main__':
-    main()
+    single = len(pairs) == 1 and not args.pair and args.manifest is None
+    if args.watch and not single:
+        parser.error("--watch takes a single INPUT and OUTPUT")
+
+    if single:
+        if args.cache_dir is not None:
+            use_template_cache(args.cache_dir)
+        if args.watch:
+            try:
+                watch(
+                    args.tmc_file, args.record_file,
+                    poll_interval=args.poll_interval,
+                    debounce=args.debounce,
+                    workers=args.workers,
+                    **options
+                )
+            except KeyboardInterrupt:
+                pass
+            return 0
+        changed, _ = make_record(
+            args.tmc_file, args.record_file, workers=args.workers, **options
+        )
+        print("{} ({})".format(args.record_file, describe_change(changed)))
+        return 0
 
+    results = run_batch(
+        pairs, workers=args.workers, log_level=args.log, **options
+    )
+    return 1 if report_batch(results) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+incremental.py
+
+This file contains the support for regenerating only the records of Symbols
+that changed since the previous build. The
+:func:`~pytmc.xml_collector.TmcFile.Symbol_hash` and the rendered records of
+every Symbol are kept in a JSON sidecar file next to the .db file. Symbols
+whose hash is unchanged reuse their previous records, the others go back
+through exploring, guessing and rendering.
+"""
+import logging
+logger = logging.getLogger(__name__)
+import json
+from collections import OrderedDict as odict
+
+from ._version import get_versions
+from .output import write_if_changed
+
+
+# Bumped whenever the layout of the sidecar file changes
+SIDECAR_FORMAT = 1
+
+# Appended to the name of the .db file to name its sidecar file
+SIDECAR_SUFFIX = '.pytmc.json'
+
+_pytmc_version = get_versions()['version']
+
+
+def sidecar_path(record_file):
+    """
+    Location of the sidecar file of a .db file
+    """
+    return record_file + SIDECAR_SUFFIX
+
+
+def load_sidecar(path):
+    """
+    Read the hashes and records of the previous build
+
+    Parameters
+    ----------
+    path : str
+        Sidecar file
+
+    Returns
+    -------
+    dict
+        (hash, records) tuples keyed by Symbol name. Empty if the file is
+        missing, unreadable or was written by another version of pytmc.
+    """
+    try:
+        with open(path, 'r') as sidecar_file:
+            content = json.load(sidecar_file)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        logger.warning("Ignoring unreadable sidecar {}: {}".format(path, e))
+        return {}
+
+    if (content.get('format') != SIDECAR_FORMAT
+            or content.get('pytmc') != _pytmc_version):
+        logger.debug("Ignoring sidecar from another pytmc: " + path)
+        return {}
+    return {
+        name: (entry['hash'], entry['records'])
+        for name, entry in content['symbols'].items()
+    }
+
+
+def store_sidecar(path, hashes, records):
+    """
+    Write the hashes and records of this build, see
+    :func:`~pytmc.output.write_if_changed`.
+
+    Parameters
+    ----------
+    path : str
+        Sidecar file
+
+    hashes : dict
+        Symbol hashes keyed by Symbol name
+
+    records : dict
+        Lists of rendered records keyed by Symbol name
+    """
+    content = {
+        'format': SIDECAR_FORMAT,
+        'pytmc': _pytmc_version,
+        'symbols': odict(
+            (name, {'hash': digest, 'records': records.get(name, [])})
+            for name, digest in hashes.items()
+        ),
+    }
+    write_if_changed(
+        path, lambda sidecar_file: json.dump(content, sidecar_file)
+    )
+
+
+def regenerate(tmc, previous, workers=None, batch=False):
+    """
+    Build the records of a :class:`~pytmc.xml_collector.TmcFile`, only
+    exploring, guessing and rendering the Symbols whose hash differs from
+    the previous build. The chains and packages of the TmcFile must not have
+    been created yet; afterwards they hold the changed Symbols only.
+
+    Parameters
+    ----------
+    tmc : :class:`~pytmc.xml_collector.TmcFile`
+
+    previous : dict
+        See :func:`~load_sidecar`
+
+    workers, batch : optional
+        See :func:`~pytmc.xml_collector.TmcFile.configure_packages`
+
+    Returns
+    -------
+    tuple
+        The hashes of every Symbol, their lists of rendered records, both
+        keyed by Symbol name in the order of the .db file, and the names of
+        the Symbols that were regenerated
+    """
+    hashes = tmc.content_hashes()
+    changed = [
+        name for name, digest in hashes.items()
+        if name not in previous or previous[name][0] != digest
+    ]
+    logger.debug(
+        "Regenerating {} of {} Symbols".format(len(changed), len(hashes))
+    )
+
+    tmc.create_chains(prune=True, symbols=changed)
+    tmc.isolate_chains()
+    tmc.create_packages()
+    tmc.configure_packages(workers=workers, batch=batch)
+    rebuilt = tmc.records_by_Symbol(workers=workers)
+
+    changed_set = set(changed)
+    records = odict()
+    for name in hashes:
+        if name in changed_set:
+            records[name] = rebuilt.get(name, [])
+        else:
+            records[name] = previous[name][1]
+    return hashes, records, changed
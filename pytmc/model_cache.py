@@ -0,0 +1,256 @@
+"""
+model_cache.py
+
+This file contains the on-disk cache of the Symbols, DataTypes and SubItems
+read from .tmc files. Entries are keyed by the content of the .tmc file and
+the pytmc version, so a cached model is only reused for the same file read by
+the same release of pytmc. Only the entry of the latest content of each input
+is kept, see :func:`~source_slot`. See the cache_dir parameter of
+:class:`~pytmc.xml_collector.TmcFile`.
+"""
+import logging
+logger = logging.getLogger(__name__)
+import hashlib
+import os
+import pickle
+import tempfile
+
+from ._version import get_versions
+
+
+# Bumped whenever the layout of the cached model changes
+CACHE_FORMAT = 1
+
+# Size of the blocks hashed by read_source
+CHUNK_SIZE = 1 << 20
+
+_pytmc_version = get_versions()['version']
+
+
+def _iter_chunks(source_file):
+    """
+    Read an open file block by block, as bytes
+    """
+    while True:
+        chunk = source_file.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        yield chunk
+
+
+def _copy_chunks(source_file, copy):
+    """
+    Read an open file block by block, as bytes, writing each block to copy
+    """
+    for chunk in _iter_chunks(source_file):
+        copy.write(chunk)
+        yield chunk
+
+
+def read_source(filename, lazy=False):
+    """
+    Hash a .tmc file block by block, so it is never held in memory as a
+    whole, and prepare it to be parsed afterwards.
+
+    Parameters
+    ----------
+    filename : str or file
+        Path of the .tmc file or an open file
+
+    lazy : bool, optional
+        See :func:`~model_key`
+
+    Returns
+    -------
+    tuple
+        The key of the file, see :func:`~model_key`, and what to parse in
+        place of filename: the same path, the same file rewound to where it
+        was, or a temporary copy if the file can't seek
+    """
+    if not hasattr(filename, 'read'):
+        with open(filename, 'rb') as tmc_file:
+            return model_key(_iter_chunks(tmc_file), lazy=lazy), filename
+
+    if filename.seekable():
+        start = filename.tell()
+        key = model_key(_iter_chunks(filename), lazy=lazy)
+        filename.seek(start)
+        return key, filename
+
+    copy = tempfile.TemporaryFile()
+    try:
+        key = model_key(_copy_chunks(filename, copy), lazy=lazy)
+        copy.seek(0)
+    except BaseException:
+        copy.close()
+        raise
+    return key, copy
+
+
+def model_key(chunks, lazy=False):
+    """
+    Produce the cache key of a .tmc file
+
+    Parameters
+    ----------
+    chunks : iterable
+        Content of the .tmc file, as blocks of bytes
+
+    lazy : bool, optional
+        Whether only the reachable DataTypes are kept, see
+        :class:`~pytmc.xml_collector.TmcFile`
+
+    Returns
+    -------
+    str
+        Hex digest of the content, the pytmc version and the options
+    """
+    digest = hashlib.sha256()
+    header = 'pytmc={};format={};lazy={}\n'.format(
+        _pytmc_version, CACHE_FORMAT, bool(lazy)
+    )
+    digest.update(header.encode('utf-8'))
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_slot(filename, lazy=False):
+    """
+    Name the cache slot of a .tmc file. A slot holds the entry of the latest
+    content read from the same path with the same options; the entries of
+    earlier contents are removed when a new one is stored.
+
+    Parameters
+    ----------
+    filename : str or file
+        Path of the .tmc file or an open file. Files without a name share a
+        single slot.
+
+    lazy : bool, optional
+        See :func:`~model_key`
+
+    Returns
+    -------
+    str
+        Short hex digest of the absolute path and the options
+    """
+    name = getattr(filename, 'name', filename)
+    if isinstance(name, str):
+        name = os.path.abspath(name)
+    else:
+        name = ''
+    digest = hashlib.sha256(
+        '{}\nlazy={}'.format(name, bool(lazy)).encode('utf-8')
+    )
+    return digest.hexdigest()[:16]
+
+
+def model_path(directory, slot, key):
+    """
+    Location of the cache entry for a slot and a key
+    """
+    return os.path.join(directory, 'model-{}-{}.pickle'.format(slot, key))
+
+
+def load_model(directory, slot, key):
+    """
+    Read a cached model
+
+    Parameters
+    ----------
+    directory : str
+        Cache directory
+
+    slot : str
+        See :func:`~source_slot`
+
+    key : str
+        See :func:`~model_key`
+
+    Returns
+    -------
+    tuple or None
+        all_Symbols, all_DataTypes and all_SubItems as stored by
+        :func:`~store_model`, or None if there is no usable entry
+    """
+    path = model_path(directory, slot, key)
+    try:
+        with open(path, 'rb') as cache_file:
+            model = pickle.load(cache_file)
+    except FileNotFoundError:
+        logger.debug("Model cache miss: " + path)
+        return None
+    except Exception as e:
+        logger.warning("Ignoring unreadable model cache {}: {}".format(
+            path, e
+        ))
+        return None
+    logger.debug("Model cache hit: " + path)
+    return model
+
+
+def store_model(directory, slot, key, model):
+    """
+    Cache a model, replacing the other entries of its slot. The entry is
+    written to a temporary file first, so a concurrent reader never sees a
+    partial entry.
+
+    Parameters
+    ----------
+    directory : str
+        Cache directory, created if missing
+
+    slot : str
+        See :func:`~source_slot`
+
+    key : str
+        See :func:`~model_key`
+
+    model : tuple
+        all_Symbols, all_DataTypes and all_SubItems of a
+        :class:`~pytmc.xml_collector.TmcFile`. The xml elements are not
+        stored.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = model_path(directory, slot, key)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as cache_file:
+            pickle.dump(model, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    logger.debug("Model cached: " + path)
+    evict_models(directory, slot, keep=path)
+
+
+def evict_models(directory, slot, keep=None):
+    """
+    Remove the entries of a slot
+
+    Parameters
+    ----------
+    directory : str
+        Cache directory
+
+    slot : str
+        See :func:`~source_slot`
+
+    keep : str, optional
+        Path of an entry to leave in place
+    """
+    prefix = 'model-{}-'.format(slot)
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not name.startswith(prefix) or path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        else:
+            logger.debug("Model evicted: " + path)
@@ -0,0 +1,83 @@
+"""
+output.py
+
+This file contains the writer used for generated files. The content is
+written next to the destination first and only moved over it if it differs,
+so an unchanged file keeps its modification time and a failed run never
+leaves a partial file behind.
+"""
+import logging
+logger = logging.getLogger(__name__)
+import os
+import shutil
+
+
+# Size of the blocks compared by same_content
+CHUNK_SIZE = 65536
+
+
+def same_content(path_a, path_b):
+    """
+    Compare two files block by block
+
+    Returns
+    -------
+    bool
+        True if both files hold the same bytes
+    """
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    with open(path_a, 'rb') as file_a, open(path_b, 'rb') as file_b:
+        while True:
+            block_a = file_a.read(CHUNK_SIZE)
+            if block_a != file_b.read(CHUNK_SIZE):
+                return False
+            if not block_a:
+                return True
+
+
+def write_if_changed(path, write, mode='w'):
+    """
+    Write a file through a temporary file in the same directory, replacing
+    the file with :func:`os.replace` only if its content changed.
+
+    Parameters
+    ----------
+    path : str
+        The file to write
+
+    write : callable
+        Called with the open temporary file to write the content
+
+    mode : str, optional
+        Mode the temporary file is opened with, 'w' or 'wb'. Defaults to
+        'w'.
+
+    Returns
+    -------
+    bool
+        True if path was created or replaced, False if it already held the
+        same content and was left untouched
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    temp_path = os.path.join(
+        directory, '.{}.{}.tmp'.format(name, os.urandom(4).hex())
+    )
+    try:
+        with open(temp_path, mode.replace('w', 'x')) as temp_file:
+            write(temp_file)
+
+        exists = os.path.exists(path)
+        if exists and same_content(temp_path, path):
+            os.remove(temp_path)
+            logger.debug("Unchanged: " + path)
+            return False
+        if exists:
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    logger.debug("Written: " + path)
+    return True
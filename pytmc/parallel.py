@@ -0,0 +1,181 @@
+"""
+parallel.py
+
+This file contains the process pool alternative to configuring and rendering
+the record packages of a :class:`~pytmc.xml_collector.TmcFile` one after
+another. Packages are sent to the worker processes in a compact form holding
+only their configuration and the attributes of their chain the guessing
+methods and templates read, never the ElementTree-backed elements. Results
+come back in the original package order.
+"""
+import logging
+logger = logging.getLogger(__name__)
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Shards per worker, so a slow shard doesn't hold up the whole pool
+SHARDS_PER_WORKER = 4
+
+CompactElement = namedtuple(
+    'CompactElement',
+    ['name', 'tc_type', 'is_array', 'is_str', 'iterable_length'],
+)
+CompactElement.__doc__ = """
+Picklable copy of the attributes of a chain element read by
+:class:`~pytmc.xml_collector.BaseRecordPackage`
+"""
+
+CompactChain = namedtuple('CompactChain', ['name_list', 'last'])
+CompactChain.__doc__ = """
+Picklable stand-in for a :class:`~pytmc.xml_collector.TmcChain`, holding the
+names of its elements and its last element as a :class:`~CompactElement`
+"""
+
+CompactPackage = namedtuple(
+    'CompactPackage', ['package_class', 'ads_port', 'chain', 'config']
+)
+CompactPackage.__doc__ = """
+Picklable form of a :class:`~pytmc.xml_collector.BaseRecordPackage`, see
+:func:`~pytmc.xml_collector.BaseRecordPackage.compact`
+"""
+
+
+def compact_chain(chain):
+    """
+    Build the :class:`~CompactChain` of a
+    :class:`~pytmc.xml_collector.TmcChain`
+    """
+    last = chain.last
+    return CompactChain(
+        name_list=tuple(chain.name_list),
+        last=CompactElement(
+            name=last.name,
+            tc_type=last.tc_type,
+            is_array=last.is_array,
+            is_str=last.is_str,
+            iterable_length=last.iterable_length,
+        ),
+    )
+
+
+def shard(items, workers):
+    """
+    Split a list into contiguous shards, :data:`SHARDS_PER_WORKER` for each
+    worker at most.
+
+    Parameters
+    ----------
+    items : list
+
+    workers : int
+        Number of worker processes
+
+    Returns
+    -------
+    list
+        Lists that, joined in order, give back items
+    """
+    count = max(1, min(len(items), workers * SHARDS_PER_WORKER))
+    size, extra = divmod(len(items), count)
+    shards = []
+    start = 0
+    for idx in range(count):
+        stop = start + size + (1 if idx < extra else 0)
+        shards.append(items[start:stop])
+        start = stop
+    return shards
+
+
+def iter_shards(func, items, workers, *args):
+    """
+    Call func(shard, *args) for every shard of items in a pool of worker
+    processes, yielding each result as soon as it and the results before it
+    are available.
+
+    Parameters
+    ----------
+    func : callable
+        Picklable function taking a shard
+
+    items : list
+
+    workers : int
+        Number of worker processes
+
+    Yields
+    ------
+    object
+        The result of func for each shard, in the order of items
+    """
+    shards = shard(items, workers)
+    logger.debug(
+        "Running {} on {} shards with {} workers".format(
+            func.__name__, len(shards), workers
+        )
+    )
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(func, part, *args) for part in shards]
+        for future in futures:
+            yield future.result()
+
+
+def map_shards(func, items, workers, *args):
+    """
+    Collect the results of :func:`~iter_shards` in a list, in the order of
+    items.
+    """
+    return list(iter_shards(func, items, workers, *args))
+
+
+def configure_shard(compact_packages, memoize=True):
+    """
+    Guess the configuration of packages given in compact form. Runs in a
+    worker process.
+
+    Parameters
+    ----------
+    compact_packages : list
+        :class:`~CompactPackage` instances holding their naive configuration
+
+    memoize : bool, optional
+        See :func:`~pytmc.xml_collector.TmcFile.configure_packages`
+
+    Returns
+    -------
+    tuple
+        The list of configuration lines of each package, the
+        :class:`collections.Counter` of fired guessing methods and the number
+        of guess cache hits and misses
+    """
+    from .xml_collector import BaseRecordPackage, guess_memoized
+
+    packages = [
+        BaseRecordPackage.from_compact(compact)
+        for compact in compact_packages
+    ]
+    fired, hits, misses = guess_memoized(packages, memoize)
+    return [pack.cfg.config for pack in packages], fired, hits, misses
+
+
+def render_shard(compact_packages):
+    """
+    Render the records of packages given in compact form. Runs in a worker
+    process.
+
+    Parameters
+    ----------
+    compact_packages : list
+        :class:`~CompactPackage` instances holding their final configuration
+
+    Returns
+    -------
+    list
+        The rendered record of each package
+    """
+    from .xml_collector import BaseRecordPackage
+
+    return [
+        BaseRecordPackage.from_compact(compact).render_record()
+        for compact in compact_packages
+    ]
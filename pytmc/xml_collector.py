@@ -6,15 +6,90 @@ interpretations. Db Files can be produced from the interpretation
 """
 import typing 
 import logging
+import os
+import hashlib
 logger = logging.getLogger(__name__)
 import xml.etree.ElementTree as ET
-from collections import defaultdict, OrderedDict as odict
+from collections import Counter, defaultdict, deque, OrderedDict as odict
 from . import Symbol, DataType, SubItem
-from copy import deepcopy, copy
-from .xml_obj import BaseElement, Configuration
-from .beckhoff import beckhoff_types
+from copy import copy
+from itertools import product
+from .xml_obj import BaseElement, Configuration, ConfigurationLayer
+from .beckhoff import beckhoff_types, io_direction, lookup_epics_type
+from .batch import guess_packages
+from . import model_cache, parallel
 from functools import reduce
-from jinja2 import Environment, PackageLoader
+from jinja2 import Environment, PackageLoader, FileSystemBytecodeCache
+
+# Longest chain (Symbol plus nested SubItems) accepted while exploring
+MAX_EXPLORE_DEPTH = 64
+
+# Number of leaf templates kept in a TmcFile.shared_templates
+TEMPLATE_CACHE_SIZE = 4096
+
+_jinja_env = None
+_jinja_bytecode_cache = None
+_jinja_templates = {}
+
+
+def get_jinja_env():
+    """
+    Return the jinja Environment shared by every TmcFile and
+    BaseRecordPackage, creating it on first use.
+
+    Returns
+    -------
+    :class:`jinja2.Environment`
+    """
+    global _jinja_env
+    if _jinja_env is None:
+        _jinja_env = Environment(
+            loader = PackageLoader("pytmc","templates"),
+            trim_blocks = True,
+            lstrip_blocks = True,
+            bytecode_cache = _jinja_bytecode_cache,
+        )
+    return _jinja_env
+
+
+def get_template(name):
+    """
+    Return the named template from the shared jinja Environment. Each
+    template is only loaded and compiled once.
+
+    Parameters
+    ----------
+    name : str
+        File name of the template in pytmc/templates
+
+    Returns
+    -------
+    :class:`jinja2.Template`
+    """
+    if name not in _jinja_templates:
+        _jinja_templates[name] = get_jinja_env().get_template(name)
+    return _jinja_templates[name]
+
+
+def use_template_cache(directory):
+    """
+    Store the compiled templates in a directory so that later runs can skip
+    compiling them. Templates already loaded are discarded.
+
+    Parameters
+    ----------
+    directory : str or None
+        Location of the bytecode cache, created if missing. None stops using
+        an on-disk cache.
+    """
+    global _jinja_env, _jinja_bytecode_cache
+    if directory is None:
+        _jinja_bytecode_cache = None
+    else:
+        os.makedirs(directory, exist_ok=True)
+        _jinja_bytecode_cache = FileSystemBytecodeCache(directory)
+    _jinja_env = None
+    _jinja_templates.clear()
 
 class ElementCollector(dict):
     '''
@@ -83,11 +158,63 @@ class TmcFile:
     all_singular_TmcChains : list
         Collection of all singularized TmcChains in the document. Must be
         initialized with :func:`~isolate_chains`.
+
+    cache_hit : bool
+        True if the Symbols, DataTypes and SubItems were loaded from the
+        model cache instead of the .tmc file.
+
+    shared_templates : collections.OrderedDict or None
+        Leaf templates kept across TmcFiles, see :func:`~leaf_template`.
+        Keyed by :func:`~DataType_hash` instead of DataType name, so a later
+        TmcFile read from an edited version of the same project reuses the
+        templates of every DataType that did not change. At most
+        :data:`TEMPLATE_CACHE_SIZE` templates are kept, the least recently
+        used are dropped first. None by default, not sharing templates.
+
+    Parameters
+    ----------
+    filename : str, file or None
+        The .tmc file to load.
+
+    stream : bool, optional
+        If True, build the Symbols, DataTypes and SubItems with
+        :func:`~isolate_all_streaming` instead of parsing the whole document.
+        :attr:`~tree` and :attr:`~root` are not kept in this mode. Defaults to
+        False.
+
+    lazy : bool, optional
+        If True, only create the DataTypes that can be reached from
+        :attr:`~all_Symbols` (see :func:`~isolate_reachable_DataTypes`).
+        Defaults to False.
+
+    cache_dir : str, optional
+        Directory of the model cache, see :mod:`~pytmc.model_cache`. If the
+        same .tmc content was read before by this version of pytmc, the
+        Symbols, DataTypes and SubItems are loaded from the cache, detached,
+        and :attr:`~tree` and :attr:`~root` are not kept. Otherwise the file
+        is parsed and the result cached. :attr:`~cache_hit` tells which
+        happened. Defaults to None, not using a cache.
     '''
-    def __init__(self, filename):
+    def __init__(self, filename, stream=False, lazy=False, cache_dir=None):
         self.filename = filename
-        if self.filename is not None:
-            self.tree = ET.parse(self.filename)
+        self.stream = stream
+        self.lazy = lazy
+        self.cache_dir = cache_dir
+
+        source = self.filename
+        model = None
+        if self.filename is not None and self.cache_dir is not None:
+            cache_slot = model_cache.source_slot(self.filename, lazy=self.lazy)
+            cache_key, source = model_cache.read_source(
+                self.filename, lazy=self.lazy
+            )
+            model = model_cache.load_model(
+                self.cache_dir, cache_slot, cache_key
+            )
+        self.cache_hit = model is not None
+
+        if source is not None and not self.stream and not self.cache_hit:
+            self.tree = ET.parse(source)
             self.root = self.tree.getroot()
         else:
             self.tree = None
@@ -96,23 +223,35 @@ class TmcFile:
         self.all_Symbols = ElementCollector()
         self.all_DataTypes = ElementCollector()
         self.all_SubItems = defaultdict(ElementCollector) 
-        if self.filename is not None:
-            self.isolate_all()
+        self._SubItem_lists = {}
+        self._leaf_templates = {}
+        self.shared_templates = None
+        self._DataType_hashes = {}
+        if self.cache_hit:
+            self.all_Symbols, self.all_DataTypes, self.all_SubItems = model
+        elif source is not None:
+            if self.stream:
+                self.isolate_all_streaming(source)
+            else:
+                self.isolate_all()
+            if self.cache_dir is not None:
+                model_cache.store_model(
+                    self.cache_dir,
+                    cache_slot,
+                    cache_key,
+                    (self.all_Symbols, self.all_DataTypes, self.all_SubItems),
+                )
         
         self.all_TmcChains = []
         self.all_singular_TmcChains = []
         self.all_RecordPackages = []
+        self.guess_rule_counts = Counter()
+        self.guess_cache_hits = 0
+        self.guess_cache_misses = 0
         
         # Load jinja templates
-        self.jinja_env = Environment(
-            loader = PackageLoader("pytmc","templates"),
-            trim_blocks = True,
-            lstrip_blocks = True,
-        )
-        
-        self.file_template = self.jinja_env.get_template(
-            "asyn_standard_file.jinja2"
-        )
+        self.jinja_env = get_jinja_env()
+        self.file_template = get_template("asyn_standard_file.jinja2")
 
     def isolate_Symbols(self):
         '''
@@ -158,6 +297,7 @@ class TmcFile:
             Specify the name string of the datatype to search for subitems.
             Subitems are automatically linked to this parent datatype.
         '''
+        self.clear_explore_cache()
         if type(parent) == str:
             parent_obj = self.all_DataTypes[parent]
             xml_subitems = parent_obj.element.findall('./SubItem')
@@ -172,6 +312,44 @@ class TmcFile:
         if type(parent) == ET.Element:
             pass
 
+    def isolate_reachable_DataTypes(self, xml_data_types=None):
+        '''
+        Populate :attr:`~all_DataTypes` and :attr:`~all_SubItems` with only
+        the DataTypes that are used by :attr:`~all_Symbols`, either directly,
+        through the SubItems of other reachable DataTypes or as their
+        ``tc_extends`` ancestors. Requires :func:`~isolate_Symbols` to have
+        been run first.
+
+        Parameters
+        ----------
+        xml_data_types : dict, optional
+            Map of DataType names to their xml elements. Defaults to every
+            DataType found in :attr:`~root`.
+        '''
+        if xml_data_types is None:
+            xml_data_types = {}
+            for xml_data_type in self.root.findall("./DataTypes/DataType"):
+                name = xml_data_type.find("./Name").text
+                xml_data_types[name] = xml_data_type
+
+        pending = deque(sym.tc_type for sym in self.all_Symbols.values())
+        while pending:
+            DataType_str = pending.popleft()
+            if (DataType_str in self.all_DataTypes
+                    or DataType_str not in xml_data_types):
+                continue
+
+            data = DataType(xml_data_types[DataType_str])
+            self.all_DataTypes.add(data)
+            self.isolate_SubItems(data.name)
+
+            if data.tc_extends is not None:
+                pending.append(data.tc_extends)
+            pending.extend(
+                s_item.tc_type
+                for s_item in self.all_SubItems[data.name].values()
+            )
+
     def resolve_enums(self):
         """
         Identify the SubItems and Datatypes that represent enum types.
@@ -201,16 +379,148 @@ class TmcFile:
     def isolate_all(self):
         '''
         Shortcut for running :func:`~isolate_Symbols` and
-        :func:`~isolate_DataTypes`
+        :func:`~isolate_DataTypes`, or :func:`~isolate_reachable_DataTypes`
+        if :attr:`~lazy` is set.
         '''
         self.isolate_Symbols()
-        self.isolate_DataTypes()
+        if self.lazy:
+            self.isolate_reachable_DataTypes()
+        else:
+            self.isolate_DataTypes()
         self.resolve_enums()
 
-    def explore_all(self):
+    def isolate_all_streaming(self, source=None):
+        '''
+        Populate :attr:`~all_Symbols`, :attr:`~all_DataTypes` and
+        :attr:`~all_SubItems` in a single pass over the .tmc file. The
+        document is read with ``iterparse`` and each DataType or Symbol is
+        cleared as soon as it has been read, leaving the instances detached
+        (see :func:`~pytmc.xml_obj.BaseElement.detach`), so the xml tree is
+        never held in memory. Everything outside of these elements is
+        discarded as it streams past.
+
+        If :attr:`~lazy` is set, the DataTypes are held as xml until every
+        Symbol has been read and only the reachable ones are created.
+
+        Parameters
+        ----------
+        source : str or file, optional
+            The .tmc file to read. Defaults to :attr:`~filename`.
+        '''
+        if source is None:
+            source = self.filename
+
+        # Open elements, from the root down to the current element
+        parents = []
+        xml_data_types = {}
+        keep_depth = None
+        area_name = None
+        symbols_done = False
+
+        for event, element in ET.iterparse(
+                    source, events=('start', 'end')):
+            if event == 'start':
+                depth = len(parents)
+                parents.append(element)
+                if keep_depth is not None:
+                    continue
+                parent_tag = parents[-2].tag if depth > 0 else None
+                if element.tag == 'DataArea':
+                    area_name = None
+                # ./DataTypes/DataType
+                if (depth == 2 and element.tag == 'DataType'
+                        and parent_tag == 'DataTypes'):
+                    keep_depth = depth
+                # ./Modules/Module/DataAreas/DataArea/Symbol
+                if (depth == 5 and element.tag == 'Symbol'
+                        and parent_tag == 'DataArea'
+                        and area_name == 'PlcTask Internal'
+                        and not symbols_done):
+                    keep_depth = depth
+                continue
+
+            parents.pop()
+            depth = len(parents)
+            parent = parents[-1] if parents else None
+
+            # Contents of a DataType or Symbol are read with their owner
+            if keep_depth is not None and depth > keep_depth:
+                continue
+
+            if depth == keep_depth:
+                keep_depth = None
+                parent.remove(element)
+                if element.tag == 'DataType' and self.lazy:
+                    name = element.find("./Name").text
+                    xml_data_types[name] = element
+                    continue
+                elif element.tag == 'DataType':
+                    data = DataType(element)
+                    self.all_DataTypes.add(data)
+                    self.isolate_SubItems(data.name)
+                    for s_item in self.all_SubItems[data.name].values():
+                        s_item.detach()
+                    data.detach()
+                else:
+                    sym = Symbol(element)
+                    self.all_Symbols.add(sym)
+                    sym.detach()
+                element.clear()
+                continue
+
+            if element.tag == 'Name' and parent is not None \
+                    and parent.tag == 'DataArea':
+                area_name = element.text
+            if element.tag == 'DataArea' and area_name == 'PlcTask Internal':
+                # Only the first matching DataArea is used
+                symbols_done = True
+
+            element.clear()
+            if parent is not None:
+                parent.remove(element)
+
+        if self.lazy:
+            self.isolate_reachable_DataTypes(xml_data_types)
+            for data in self.all_DataTypes.values():
+                for s_item in self.all_SubItems[data.name].values():
+                    s_item.detach()
+                data.detach()
+            for element in xml_data_types.values():
+                element.clear()
+
+        self.resolve_enums()
+
+    def free_tree(self):
+        '''
+        Detach every Symbol, DataType and SubItem from its xml element and
+        release the parsed document. The isolate methods can not be used
+        afterwards.
+        '''
+        for sym in self.all_Symbols.values():
+            sym.detach()
+        for data in self.all_DataTypes.values():
+            data.detach()
+        for datatype_name in self.all_SubItems:
+            for s_item in self.all_SubItems[datatype_name].values():
+                s_item.detach()
+        self.tree = None
+        self.root = None
+
+    def explore_all(self, prune=False, max_depth=None):
         """
         Return a list of ALL paths to leaf-variables in the tmc file.
 
+        Parameters
+        ----------
+        prune : bool, optional
+            If True, do not descend into Symbols or SubItems lacking a pytmc
+            pragma. Such paths can never be singularized into records so
+            skipping them leaves the generated records unchanged. Defaults to
+            False.
+
+        max_depth : int, optional
+            Longest path allowed. Defaults to :data:`MAX_EXPLORE_DEPTH`.
+
         Returns
         -------
         list 
@@ -220,12 +530,41 @@ class TmcFile:
             encapsulation to find the final value itself. For each value, this
             list contains a single row. 
         """
-        results = []
+        return list(self.iter_explore_all(prune=prune, max_depth=max_depth))
+
+    def iter_explore_all(self, prune=False, max_depth=None, symbols=None):
+        """
+        Lazily produce the paths returned by :func:`~explore_all`, in the same
+        order.
+
+        Parameters
+        ----------
+        prune : bool, optional
+            See :func:`~explore_all`. Defaults to False.
+
+        max_depth : int, optional
+            Longest path allowed. Defaults to :data:`MAX_EXPLORE_DEPTH`.
+
+        symbols : iterable of str, optional
+            Only explore the Symbols with these names, still in the order of
+            :attr:`~all_Symbols`. Defaults to every Symbol.
+
+        Yields
+        ------
+        list
+            The path to a single leaf-item
+        """
+        self.clear_explore_cache()
+        if symbols is not None:
+            symbols = set(symbols)
         for sym in self.all_Symbols:
-            results.extend(self.recursive_explore([self.all_Symbols[sym]]))
-        return results
+            if symbols is not None and sym not in symbols:
+                continue
+            yield from self.iter_explore(
+                [self.all_Symbols[sym]], prune=prune, max_depth=max_depth
+            )
 
-    def recursive_explore(self, root_path):
+    def recursive_explore(self, root_path, prune=False, max_depth=None):
         """
         Given a starting Symbol or SubItem, recursively explore the contents of
         the target and return a list for the path to each final leaf-item. 
@@ -237,6 +576,14 @@ class TmcFile:
             list is composed of :class:`~Symbol` and :class:`~SubItem`
             instances
 
+        prune : bool, optional
+            If True, stop exploring at any :class:`~Symbol` or
+            :class:`~SubItem` without a pragma. No paths are returned for the
+            pruned branch. Defaults to False.
+
+        max_depth : int, optional
+            Longest path allowed. Defaults to :data:`MAX_EXPLORE_DEPTH`.
+
         Returns
         -------
         list
@@ -244,30 +591,202 @@ class TmcFile:
             individual lists are the paths through the tree to each leaf-item
             charted by :class:`~Symbol` and :class:`~SubItem`.
         """
+        return list(
+            self.iter_explore(root_path, prune=prune, max_depth=max_depth)
+        )
+
+    def iter_explore(self, root_path, prune=False, max_depth=None):
+        """
+        Lazily produce the paths returned by :func:`~recursive_explore`. The
+        DataTypes are walked with an explicit stack rather than recursion.
+
+        Parameters
+        ----------
+        root_path : list
+            This is a list leading to the initial item to explore from
+
+        prune : bool, optional
+            See :func:`~recursive_explore`. Defaults to False.
+
+        max_depth : int, optional
+            Longest path allowed. Defaults to :data:`MAX_EXPLORE_DEPTH`.
+
+        Yields
+        ------
+        list
+            The path to a single leaf-item
+
+        Raises
+        ------
+        ExplorationError
+            If a path is longer than max_depth or a DataType contains itself
+        """
+        if max_depth is None:
+            max_depth = MAX_EXPLORE_DEPTH
         root = root_path[-1]
-        response = []
-        target_SubItems = []
-        
-        # If this is a user defined datatype
+
+        # Elements without a pragma can't be part of a singular chain
+        if prune and root.pragma is None:
+            return
+
+        # If not a use defined datatype
         DataType_str = root.tc_type
-        if DataType_str in self.all_DataTypes:
-            
-            # Accumulate list of SubItems in this Subitem/Symbol
-            target_DataType = self.all_DataTypes[DataType_str]
-            target_SubItems.extend(
-                self.recursive_list_SubItems(target_DataType)
-            )
+        if DataType_str not in self.all_DataTypes:
+            if len(root_path) > max_depth:
+                raise ExplorationError(
+                    "Path exceeds the depth limit of {}".format(max_depth)
+                )
+            yield root_path
+            return
+
+        # Extend the path with each of the leaf paths shared by all instances
+        # of the datatype
+        template = self.leaf_template(DataType_str, prune, max_depth)
+        for relative_path in template:
+            if len(root_path) + len(relative_path) > max_depth:
+                raise ExplorationError(
+                    "Path exceeds the depth limit of {}".format(max_depth)
+                )
+            yield root_path + list(relative_path)
 
-            # For each subitem in this object/datatype explore further 
-            for subitem in target_SubItems:
-                new_paths = self.recursive_explore(root_path + [subitem])
-                response.extend(new_paths)
+    def leaf_template(self, DataType_str, prune=False, max_depth=None):
+        """
+        Return the paths from an instance of a DataType to each of its
+        leaf-items. The result is computed once per DataType and reused for
+        every instance until :func:`~clear_explore_cache` is called, and
+        taken from :attr:`~shared_templates` if it holds the same DataType.
 
-            return response
+        Parameters
+        ----------
+        DataType_str : str
+            Name of the user defined DataType in :attr:`~all_DataTypes`
 
-        # If not a use defined datatype
-        else:
-            return [root_path]
+        prune : bool, optional
+            If True, leave out paths passing through SubItems without a
+            pragma. Defaults to False.
+
+        max_depth : int, optional
+            Deepest nesting of DataTypes allowed. Defaults to
+            :data:`MAX_EXPLORE_DEPTH`.
+
+        Returns
+        -------
+        tuple
+            Contains a tuple of :class:`~SubItem` for each leaf-item, ordered
+            as in :func:`~recursive_explore`. The owning Symbol or SubItem is
+            not included.
+
+        Raises
+        ------
+        ExplorationError
+            If the DataTypes nest deeper than max_depth or contain themselves
+        """
+        if max_depth is None:
+            max_depth = MAX_EXPLORE_DEPTH
+        key = (DataType_str, prune)
+        template = self._known_template(DataType_str, prune, max_depth)
+        if template is not None:
+            return template
+
+        # Each frame holds a DataType name, an iterator over its SubItems, the
+        # template gathered so far and the SubItem waiting on a nested
+        # DataType's template
+        stack = [[DataType_str, self._iter_SubItems(DataType_str), [], None]]
+        active = {DataType_str}
+        while stack:
+            frame = stack[-1]
+            name, subitems, template, waiting = frame
+            if waiting is not None:
+                template.extend(
+                    (waiting,) + relative_path
+                    for relative_path
+                    in self._leaf_templates[(waiting.tc_type, prune)]
+                )
+                frame[3] = None
+
+            for subitem in subitems:
+                if prune and subitem.pragma is None:
+                    continue
+                child_str = subitem.tc_type
+                if child_str not in self.all_DataTypes:
+                    template.append((subitem,))
+                    continue
+                known = self._known_template(child_str, prune, max_depth)
+                if known is not None:
+                    template.extend(
+                        (subitem,) + relative_path
+                        for relative_path in known
+                    )
+                    continue
+                if child_str in active:
+                    raise ExplorationError(
+                        "DataType {} contains itself".format(child_str)
+                    )
+                if len(stack) >= max_depth:
+                    raise ExplorationError(
+                        "DataTypes nest deeper than the limit of {}".format(
+                            max_depth
+                        )
+                    )
+                # Finish the nested DataType then come back to this SubItem
+                frame[3] = subitem
+                active.add(child_str)
+                stack.append(
+                    [child_str, self._iter_SubItems(child_str), [], None]
+                )
+                break
+            else:
+                stack.pop()
+                active.discard(name)
+                self._store_template(name, prune, max_depth, tuple(template))
+
+        return self._leaf_templates[key]
+
+    def _known_template(self, DataType_str, prune, max_depth):
+        """
+        Find an existing leaf template, see :func:`~leaf_template`, or None
+        """
+        key = (DataType_str, prune)
+        template = self._leaf_templates.get(key)
+        if template is None and self.shared_templates is not None:
+            shared_key = (self.DataType_hash(DataType_str), prune, max_depth)
+            template = self.shared_templates.get(shared_key)
+            if template is not None:
+                self.shared_templates.move_to_end(shared_key)
+                self._leaf_templates[key] = template
+        return template
+
+    def _store_template(self, DataType_str, prune, max_depth, template):
+        """
+        Keep a new leaf template, see :func:`~leaf_template`
+        """
+        self._leaf_templates[(DataType_str, prune)] = template
+        if self.shared_templates is None:
+            return
+        shared_key = (self.DataType_hash(DataType_str), prune, max_depth)
+        self.shared_templates[shared_key] = template
+        while len(self.shared_templates) > TEMPLATE_CACHE_SIZE:
+            self.shared_templates.popitem(last=False)
+
+    def _iter_SubItems(self, DataType_str):
+        """
+        Iterate over the SubItems of the named DataType, see
+        :func:`~recursive_list_SubItems`
+        """
+        return iter(self.recursive_list_SubItems(
+            self.all_DataTypes[DataType_str]
+        ))
+
+    def clear_explore_cache(self):
+        """
+        Discard the SubItem lists, leaf templates and DataType hashes memoized
+        while exploring. This is done automatically whenever SubItems are
+        isolated and at the start of :func:`~explore_all`.
+        :attr:`~shared_templates` is left untouched.
+        """
+        self._SubItem_lists.clear()
+        self._leaf_templates.clear()
+        self._DataType_hashes.clear()
         
     def recursive_list_SubItems(self, root_DataType):
         """
@@ -283,30 +802,138 @@ class TmcFile:
         -------
         list
             list of :class:`~SubItem` of contained subItems
+
+        Raises
+        ------
+        ExplorationError
+            If the chain of inherited DataTypes loops back on itself
         """
-        response = []
         root_DataType_str = root_DataType.name
+        if root_DataType_str in self._SubItem_lists:
+            return list(self._SubItem_lists[root_DataType_str])
+
+        # Walk up the inherited DataTypes
+        lineage = []
+        DataType_str = root_DataType_str
+        while DataType_str is not None:
+            if DataType_str in lineage:
+                raise ExplorationError(
+                    "DataType {} extends itself".format(DataType_str)
+                )
+            lineage.append(DataType_str)
+            DataType_str = self.all_DataTypes[DataType_str].tc_extends
 
-        # Recursively explore inherited DataTypes
-        parent_DataType_str = self.all_DataTypes[root_DataType_str].tc_extends
-        if parent_DataType_str is not None:
-            parent_DataType = self.all_DataTypes[parent_DataType_str]
-            response.extend(self.recursive_list_SubItems(parent_DataType))
-
-        # Append all SubItems from THIS DataType
-        SubItem_str_list = self.all_SubItems[root_DataType_str]
-        response.extend(
-            [self.all_SubItems[root_DataType_str][z] for z in SubItem_str_list]
-        )
+        # Append the SubItems from the most distant ancestor down to THIS
+        # DataType
+        response = []
+        for DataType_str in reversed(lineage):
+            SubItem_str_list = self.all_SubItems[DataType_str]
+            response.extend(
+                [self.all_SubItems[DataType_str][z] for z in SubItem_str_list]
+            )
 
+        self._SubItem_lists[root_DataType_str] = tuple(response)
         return response
 
-    def create_chains(self):
+    def DataType_hash(self, DataType_str):
+        """
+        Produce a hash of a DataType covering its own content, its SubItems
+        and, the same way, every DataType reachable from it through SubItems
+        or ``tc_extends``. The hash is stable between runs and only changes
+        if one of these DataTypes changes.
+
+        Parameters
+        ----------
+        DataType_str : str
+            Name of the DataType
+
+        Returns
+        -------
+        str
+            Hex digest, or an empty string if there is no such DataType
+        """
+        if DataType_str in self._DataType_hashes:
+            return self._DataType_hashes[DataType_str]
+
+        reachable = set()
+        pending = [DataType_str]
+        while pending:
+            name = pending.pop()
+            if name in reachable or name not in self.all_DataTypes:
+                continue
+            reachable.add(name)
+            pending.extend(self.all_DataTypes[name].type_names)
+            for s_item in self.all_SubItems.get(name, {}).values():
+                pending.extend(s_item.type_names)
+
+        if not reachable:
+            result = ''
+        else:
+            digest = hashlib.sha256()
+            for name in sorted(reachable):
+                entries = [self.all_DataTypes[name]]
+                entries.extend(self.all_SubItems.get(name, {}).values())
+                for entry in entries:
+                    digest.update(repr(entry.content_key()).encode('utf-8'))
+                    digest.update(b'\n')
+            result = digest.hexdigest()
+
+        self._DataType_hashes[DataType_str] = result
+        return result
+
+    def Symbol_hash(self, Symbol_str):
+        """
+        Produce a hash of a Symbol covering its own content and the
+        :func:`~DataType_hash` of each type it refers to. Symbols with an
+        unchanged hash produce the same records.
+
+        Parameters
+        ----------
+        Symbol_str : str
+            Name of the Symbol
+
+        Returns
+        -------
+        str
+            Hex digest
+        """
+        sym = self.all_Symbols[Symbol_str]
+        digest = hashlib.sha256()
+        digest.update(repr(sym.content_key()).encode('utf-8'))
+        for name in sym.type_names:
+            digest.update(b'\n')
+            digest.update(self.DataType_hash(name).encode('utf-8'))
+        return digest.hexdigest()
+
+    def content_hashes(self):
+        """
+        Produce the :func:`~Symbol_hash` of every Symbol
+
+        Returns
+        -------
+        OrderedDict
+            Hex digests keyed by Symbol name, in the order of
+            :attr:`~all_Symbols`
+        """
+        return odict(
+            (name, self.Symbol_hash(name)) for name in self.all_Symbols
+        )
+
+    def create_chains(self, prune=False, symbols=None):
         """
         Add all new TmcChains to this object instance's all_TmcChains variable
+
+        Parameters
+        ----------
+        prune : bool, optional
+            Skip branches without pragmas while exploring. See
+            :func:`~explore_all`. Defaults to False.
+
+        symbols : iterable of str, optional
+            Only explore the Symbols with these names. Defaults to every
+            Symbol.
         """
-        full_list = self.explore_all()
-        for row in full_list:
+        for row in self.iter_explore_all(prune=prune, symbols=symbols):
             self.all_TmcChains.append(TmcChain(row))
     
     def isolate_chains(self):
@@ -315,10 +942,21 @@ class TmcFile:
         the the entries in self.all_TmcChains. Requires create_chains to have
         been run first.
         """
+        self.all_singular_TmcChains.extend(self.iter_singular_chains())
+
+    def iter_singular_chains(self):
+        """
+        Lazily produce the singularized versions of the entries in
+        self.all_TmcChains. Requires create_chains to have been run first.
+
+        Yields
+        ------
+        TmcChain
+            Each singular chain, in the order used by
+            :func:`~isolate_chains`
+        """
         for non_singular in self.all_TmcChains:
-            new_singular_chains = non_singular.build_singular_chains()
-            for chain in new_singular_chains:
-                self.all_singular_TmcChains.append(chain)
+            yield from non_singular.iter_singular_chains()
 
     def create_packages(self):
         """
@@ -330,34 +968,255 @@ class TmcFile:
             #brp = BaseRecordPackage(chain=singular_chain, origin=chain)
             self.all_RecordPackages.append(brp)
 
-    def configure_packages(self):
+    def configure_packages(self, memoize=True, batch=False, workers=None):
         """
         Apply guessing methods to self.all_RecordPackages.
+
+        Parameters
+        ----------
+        memoize : bool, optional
+            If True, only run the guessing methods once for each
+            :func:`~BaseRecordPackage.guess_signature` and copy the guessed
+            lines to the other packages with that signature. The outcome is
+            tallied in :attr:`~guess_cache_hits` and
+            :attr:`~guess_cache_misses`. Defaults to True.
+
+        batch : bool, optional
+            If True, make the guesses for all packages at once with
+            :func:`~pytmc.batch.guess_packages` instead. memoize and workers
+            are then ignored. Requires numpy. Defaults to False.
+
+        workers : int, optional
+            If greater than 1, shard the packages across this many worker
+            processes, see :mod:`~pytmc.parallel`. Signatures are only
+            memoized within a shard. The resulting configurations are the
+            same as a serial run. Defaults to None, guessing in this process.
         """
         removal_list = []
+        guess_list = []
         for idx, pack in enumerate(self.all_RecordPackages):
             try:
                 pack.generate_naive_config()
-                pack.guess_all()
             except ChainNotSingularError:
                 removal_list.append(idx)
+                continue
+            guess_list.append(pack)
+
+        if batch:
+            self.guess_rule_counts.update(guess_packages(guess_list))
+        elif workers is not None and workers > 1 and guess_list:
+            results = parallel.map_shards(
+                parallel.configure_shard,
+                [pack.compact() for pack in guess_list],
+                workers,
+                memoize,
+            )
+            configs = []
+            for shard_configs, fired, hits, misses in results:
+                configs.extend(shard_configs)
+                self.guess_rule_counts.update(fired)
+                self.guess_cache_hits += hits
+                self.guess_cache_misses += misses
+            for pack, config in zip(guess_list, configs):
+                pack.cfg = Configuration(config=config)
+        else:
+            fired, hits, misses = guess_memoized(guess_list, memoize)
+            self.guess_rule_counts.update(fired)
+            self.guess_cache_hits += hits
+            self.guess_cache_misses += misses
 
         logger.debug("Invalid RecordPackages: " + str(len(removal_list)))
+        logger.debug("Guessing rules fired: " + str(self.guess_rule_counts))
+        logger.debug(
+            "Guess cache hit rate: {:.1%}".format(self.guess_cache_hit_rate)
+        )
+        logger.debug(
+            "Pragma parse cache: " + str(Configuration.parse_cache_info())
+        )
         #must remove highest index first so not to disturb index/entry mapping
         removal_list.reverse()
         for idx in removal_list:
             self.all_RecordPackages.pop(idx)
 
-    def render(self):
+    @property
+    def guess_cache_hit_rate(self):
         """
-        Produce .db file as string
+        Fraction of the memoized packages in :func:`~configure_packages` that
+        reused guessed lines. 0 if no package was memoized.
+        """
+        total = self.guess_cache_hits + self.guess_cache_misses
+        if total == 0:
+            return 0.0
+        return self.guess_cache_hits / total
+
+    def iter_records(self, workers=None):
         """
-        rec_list = []
+        Render the record of each package in self.all_RecordPackages, one at
+        a time.
+
+        Parameters
+        ----------
+        workers : int, optional
+            If greater than 1, render the records in this many worker
+            processes, see :mod:`~pytmc.parallel`. Records are kept in the
+            order of self.all_RecordPackages. Defaults to None, rendering in
+            this process.
+
+        Yields
+        ------
+        str
+            Jinja rendered entry for each package
+        """
+        if workers is not None and workers > 1 and self.all_RecordPackages:
+            results = parallel.iter_shards(
+                parallel.render_shard,
+                [pack.compact() for pack in self.all_RecordPackages],
+                workers,
+            )
+            for part in results:
+                yield from part
+            return
+
         for pack in self.all_RecordPackages:
-            record_str = pack.render_record()
-            rec_list.append(record_str)
+            yield pack.render_record()
+
+    def records_by_Symbol(self, workers=None):
+        """
+        Render the record of each package in self.all_RecordPackages, grouped
+        by the Symbol its chain starts from.
+
+        Parameters
+        ----------
+        workers : int, optional
+            See :func:`~iter_records`
+
+        Returns
+        -------
+        OrderedDict
+            Lists of rendered records keyed by Symbol name, in the order of
+            self.all_RecordPackages
+        """
+        result = odict()
+        records = self.iter_records(workers=workers)
+        for pack, record_str in zip(self.all_RecordPackages, records):
+            result.setdefault(pack.chain.chain[0].name, []).append(record_str)
+        return result
+
+    def iter_render(self, workers=None, records=None):
+        """
+        Produce the .db file piece by piece, rendering each record only when
+        the file template reaches it. Joining the pieces gives
+        :func:`~render`.
+
+        Parameters
+        ----------
+        workers : int, optional
+            See :func:`~iter_records`
+
+        records : iterable of str, optional
+            Rendered records to write instead of those of
+            self.all_RecordPackages
+
+        Yields
+        ------
+        str
+            Consecutive pieces of the .db file
+        """
+        if records is None:
+            records = self.iter_records(workers=workers)
+        return self.file_template.generate(records=records)
 
-        return self.file_template.render(records=rec_list)
+    def render_to(self, stream, workers=None, buffer_size=65536,
+                  records=None):
+        """
+        Write the .db file to a file-like object as it is produced, without
+        holding the whole file in memory.
+
+        Parameters
+        ----------
+        stream : file-like
+            Text stream with a write method
+
+        workers : int, optional
+            See :func:`~iter_records`
+
+        buffer_size : int, optional
+            Number of characters gathered before each write. Defaults to
+            65536.
+
+        records : iterable of str, optional
+            See :func:`~iter_render`
+        """
+        buffer = []
+        buffered = 0
+        pieces = self.iter_render(workers=workers, records=records)
+        for piece in pieces:
+            buffer.append(piece)
+            buffered += len(piece)
+            if buffered >= buffer_size:
+                stream.write(''.join(buffer))
+                buffer = []
+                buffered = 0
+        if buffer:
+            stream.write(''.join(buffer))
+
+    def render(self, workers=None, records=None):
+        """
+        Produce .db file as string
+
+        Parameters
+        ----------
+        workers : int, optional
+            See :func:`~iter_records`
+
+        records : iterable of str, optional
+            See :func:`~iter_render`
+        """
+        return ''.join(self.iter_render(workers=workers, records=records))
+
+
+def guess_memoized(packages, memoize=True):
+    """
+    Run :func:`~BaseRecordPackage.guess_all` on packages holding their naive
+    configuration. See :func:`~TmcFile.configure_packages`.
+
+    Parameters
+    ----------
+    packages : list
+        :class:`~BaseRecordPackage` instances
+
+    memoize : bool, optional
+        If True, guess once per :func:`~BaseRecordPackage.guess_signature`
+        and apply the guessed lines to the other packages sharing it
+
+    Returns
+    -------
+    tuple
+        The :class:`collections.Counter` of fired guessing methods, counted
+        once per package whether guessed or reusing lines, the number of
+        packages reusing guessed lines and the number of packages
+        guessed for a signature
+    """
+    fired = Counter()
+    hits = 0
+    misses = 0
+    guessed = {}
+    for pack in packages:
+        signature = pack.guess_signature() if memoize else None
+        if signature is not None and signature in guessed:
+            lines, counts = guessed[signature]
+            pack.apply_guesses(lines)
+            fired.update(counts)
+            hits += 1
+            continue
+
+        naive_length = len(pack.cfg.config)
+        counts = pack.guess_all()
+        fired.update(counts)
+        if signature is not None:
+            guessed[signature] = pack.cfg.config[naive_length:], counts
+            misses += 1
+    return fired, hits, misses
 
 
 class ChainNotSingularError(Exception):
@@ -368,6 +1227,142 @@ class MissingConfigError(Exception):
     pass
 
 
+class ExplorationError(Exception):
+    pass
+
+
+# Properties of element classes, found by _element_property
+_element_properties = {}
+
+
+def _element_property(cls, name):
+    """
+    Find the property called name on an element class, or None if name is
+    something else, such as a slot or a method
+    """
+    key = (cls, name)
+    try:
+        return _element_properties[key]
+    except KeyError:
+        pass
+    attribute = None
+    for klass in cls.__mro__:
+        if name in klass.__dict__:
+            attribute = klass.__dict__[name]
+            break
+    if not isinstance(attribute, property):
+        attribute = None
+    _element_properties[key] = attribute
+    return attribute
+
+
+class SingularElement:
+    """
+    View of a :class:`~pytmc.xml_obj.BaseElement` bound to one of its
+    configurations, used for the entries of singular TmcChains. The element
+    itself is shared by every singular chain built from the same TmcChain;
+    the view only records the selected configuration name and materializes
+    the matching :class:`~pytmc.xml_obj.Configuration` when
+    :attr:`~pragma` is first read.
+
+    Attributes not defined here are read from the underlying element.
+    Attributes set on the view, directly or through a property setter of the
+    element, are stored on the view and do not affect the shared element.
+    Once the view holds such an attribute, the properties of the element
+    are evaluated against the view, so values derived from it (e.g.
+    ``iterable_length`` after setting ``is_str``) follow the view. Methods
+    still run on the element itself.
+
+    Views are not :class:`~pytmc.xml_obj.BaseElement` instances, use
+    :attr:`~target` to reach the element itself.
+
+    Parameters
+    ----------
+    base : :class:`~pytmc.xml_obj.BaseElement` or SingularElement
+        The element this view represents
+
+    config_name : str
+        The name of the configuration selected for this element
+    """
+    __slots__ = ('base', 'config_name', '_pragma', '_overrides')
+
+    def __init__(self, base, config_name):
+        self.base = base
+        self.config_name = config_name
+        self._pragma = None
+        self._overrides = None
+
+    @property
+    def pragma(self):
+        """
+        The Configuration of the underlying element cut down to
+        :attr:`~config_name`, or None if the element has no pragma.
+        """
+        if self._pragma is None:
+            base_pragma = self.base.pragma
+            if base_pragma is None:
+                return None
+            self._pragma = base_pragma.singular_copy(self.config_name)
+        return self._pragma
+
+    @pragma.setter
+    def pragma(self, new_pragma):
+        self._pragma = new_pragma
+
+    @property
+    def target(self):
+        """
+        Return the underlying :class:`~pytmc.xml_obj.BaseElement`, skipping
+        any intermediate views.
+        """
+        target = self.base
+        while isinstance(target, SingularElement):
+            target = target.base
+        return target
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in SingularElement.__slots__:
+            raise AttributeError(name)
+        if self._overrides is None:
+            return getattr(self.base, name)
+        if name in self._overrides:
+            return self._overrides[name]
+        attribute = _element_property(type(self.target), name)
+        if attribute is not None:
+            return attribute.fget(self)
+        return getattr(self.base, name)
+
+    def __setattr__(self, name, value):
+        if name in SingularElement.__slots__ or name == 'pragma':
+            object.__setattr__(self, name, value)
+            return
+        attribute = _element_property(type(self.target), name)
+        if attribute is not None and attribute.fset is not None:
+            attribute.fset(self, value)
+            return
+        if self._overrides is None:
+            self._overrides = {}
+        self._overrides[name] = value
+
+    def __eq__(self, other):
+        """
+        Views are equal to each other and to elements if they represent the
+        same underlying element.
+        """
+        if isinstance(other, SingularElement):
+            other = other.target
+        if not isinstance(other, BaseElement):
+            return NotImplemented
+        return self.target == other
+
+    def __repr__(self):
+        return "{}(base={}, config_name={!r})".format(
+            self.__class__.__name__,
+            self.base,
+            self.config_name
+        )
+
+
 class TmcChain:
     """
     Pointer to the tmc instances and track order. Leaf node is last.
@@ -434,7 +1429,27 @@ class TmcChain:
 
         return True
 
-    def _recursive_permute(self, master_list, so_far=None):
+    def _iter_permute(self, master_list):
+        """
+        For a given list of lists, lazily produce all possible combinations of
+        lists in which the interior list defines the acceptable values for
+        that place in the list. The first place varies fastest.
+
+        Parameters
+        ----------
+        master_list : list
+            This list contains a list at each index. These internal lists
+            specify the acceptable values at each location in the output lists
+
+        Yields
+        ------
+        tuple
+            One value for each place in master_list
+        """
+        for reversed_seq in product(*reversed(master_list)):
+            yield reversed_seq[::-1]
+
+    def _recursive_permute(self, master_list):
         """
         For a given list of lists, create all possible combinations of lists in
         which the interior list defines the acceptable values for that place in
@@ -446,36 +1461,38 @@ class TmcChain:
             This list contains a list at each index. These internal lists
             specify the acceptable values at each location in the output lists
 
-        so_far : list or None
-            Only used for internal recursive work. This lists the the 'so_far'
-            assembled chains. This list grows with each iteration, either in
-            length or in the length of the contained lists 
         Returns
         -------
         list
             This list contains a single list for each possible permutation.
         """
-        if so_far is None:
-            so_far = [[]]
+        return [
+            [[term] for term in seq] for seq in self._iter_permute(master_list)
+        ]
+
+    def iter_singular_chains(self):
+        """
+        Lazily generate all acceptable configurations, one at a time.
+
+        Yields
+        ------
+        TmcChain
+            Chain bound to one of the possible paths given the configurations
+            available at each step. The entries of these chains are
+            :class:`~SingularElement` views sharing the elements of this
+            chain.
+        """
+        forkmap = self.forkmap()
+        # Elements without configurations can not be part of a singular chain
+        if not all(forkmap):
+            return
+
+        for seq in self._iter_permute(forkmap):
+            yield TmcChain([
+                SingularElement(entry, select_name)
+                for entry, select_name in zip(self.chain, seq)
+            ])
 
-        replicate_count = len(so_far)
-        
-        extras = []
-        for i in range(len(master_list[0])-1):
-            for chain in so_far:
-                extras.append(deepcopy(chain))
-        so_far.extend(extras)
-
-        for term, term_index in zip(master_list[0],range(len(master_list[0]))):
-            for i in range(replicate_count):
-                index = term_index * replicate_count + i
-                so_far[index].append([term])
-
-        if len(master_list) > 1:
-            return self._recursive_permute(master_list[1:],so_far)
-        else:
-            return so_far
-            
     def build_singular_chains(self):
         """
         Generate list of all acceptable configurations. 
@@ -484,30 +1501,21 @@ class TmcChain:
         -------
         list
             List of TmcChains. Each chain is bound to one of the possible paths
-            given the configurations available at each step. 
-        """
-        name_sequences = self._recursive_permute(self.forkmap())
-        logging.debug(str(name_sequences))
-        results = []
-        append = True
-        for seq in name_sequences:
-            new_TmcChain = deepcopy(self)
-            for config, select_name in zip(new_TmcChain.chain, seq):
-                if config.pragma is not None:
-                    config.pragma.fix_to_config_name(select_name[0])
-                else:
-                    append = False
-            if append:
-                results.append(new_TmcChain)
-            else:
-                append = True
-        return results
+            given the configurations available at each step. See
+            :func:`~iter_singular_chains`.
+        """
+        return list(self.iter_singular_chains())
 
     def naive_config(self, cc_symbol = ":"):
         """
         On chains of singular configs, stack up configurations from lowest to
         highest to generate a guess-free configuration.
 
+        The stacked configurations are kept as cached
+        :class:`~pytmc.xml_obj.ConfigurationLayer` instances, so chains
+        sharing their leading elements and pragmas only build those layers
+        once.
+
         Returns
         -------
         Configuration
@@ -517,8 +1525,15 @@ class TmcChain:
         if not self.is_singular():
             raise ChainNotSingularError
 
+        layer = ConfigurationLayer.EMPTY
+        for entry in self.chain:
+            layer = layer.overlay(entry.pragma, cc_symbol = cc_symbol)
+            if layer is None:
+                break
+        else:
+            return layer.configuration()
+
         new_config = Configuration(config=[])
-        cfg_title = ""
         for entry in self.chain:
             new_config.concat(entry.pragma, cc_symbol = cc_symbol)
         
@@ -557,6 +1572,81 @@ class TmcChain:
         return "TmcChain: " + str(self.name_list)
 
 
+class GuessRule:
+    """
+    Describe a guessing method of :class:`~BaseRecordPackage` by the
+    configuration it depends on and the configuration it may add.
+
+    Parameters
+    ----------
+    method : str
+        Name of the guessing method
+
+    reads : iterable of str, optional
+        Titles of configuration lines or names of fields the method reads
+
+    writes : iterable of str, optional
+        Titles of configuration lines or names of fields the method may add
+    """
+    def __init__(self, method, reads=(), writes=()):
+        self.method = method
+        self.reads = frozenset(reads)
+        self.writes = frozenset(writes)
+
+    def __repr__(self):
+        return "GuessRule({!r})".format(self.method)
+
+
+class RuleOrderError(Exception):
+    pass
+
+
+def order_rules(rules):
+    """
+    Sort rules so that each one comes after every other rule writing
+    configuration it reads. Among the rules that are ready, the one listed
+    first is taken first, so independent rules keep their listed order.
+
+    Parameters
+    ----------
+    rules : list
+        :class:`~GuessRule` instances
+
+    Returns
+    -------
+    list
+        The same rules in dependency order
+
+    Raises
+    ------
+    RuleOrderError
+        If the rules depend on each other in a cycle
+    """
+    depends_on = [
+        {
+            other_idx for other_idx, other in enumerate(rules)
+            if other_idx != idx and other.writes & rule.reads
+        }
+        for idx, rule in enumerate(rules)
+    ]
+    ordered = []
+    done = set()
+    while len(done) < len(rules):
+        for idx, rule in enumerate(rules):
+            if idx not in done and depends_on[idx] <= done:
+                ordered.append(rule)
+                done.add(idx)
+                break
+        else:
+            raise RuleOrderError(
+                "Cyclic dependency between rules: {}".format(
+                    [rule for idx, rule in enumerate(rules)
+                     if idx not in done]
+                )
+            )
+    return ordered
+
+
 class BaseRecordPackage:
     """
     BaseRecordPackage includes some basic funcionality that should be shared
@@ -565,6 +1655,25 @@ class BaseRecordPackage:
     variable. Overwrite/inherit features as necessary. 
 
     """
+    # Guessing methods with the configuration lines and fields each one
+    # reads and writes. guess_all uses these to order the methods.
+    guess_rules = [
+        GuessRule('guess_common', reads=['PINI', 'TSE'],
+                  writes=['PINI', 'TSE']),
+        GuessRule('guess_type', reads=['type', 'io'], writes=['type']),
+        GuessRule('guess_io', reads=['io'], writes=['io']),
+        GuessRule('guess_DTYP', reads=['DTYP', 'io'], writes=['DTYP']),
+        GuessRule('guess_INP_OUT', reads=['io', 'INP', 'OUT'],
+                  writes=['INP', 'OUT']),
+        GuessRule('guess_SCAN', reads=['SCAN', 'io'],
+                  writes=['SCAN', 'info']),
+        GuessRule('guess_OZ_NAM', reads=['ONAM', 'ZNAM'],
+                  writes=['ONAM', 'ZNAM']),
+        GuessRule('guess_PREC', reads=['PREC', 'type'], writes=['PREC']),
+        GuessRule('guess_FTVL', reads=['FTVL'], writes=['FTVL']),
+        GuessRule('guess_NELM', reads=['NELM'], writes=['NELM']),
+    ]
+
     def __init__(self, chain=None, origin=None):
         """
         All subclasses should use super on their init method.
@@ -579,18 +1688,10 @@ class BaseRecordPackage:
         # ^could be relevant for init fields
         # Will continue without this for now 
 
-        # List of methods defined in the class 
+        # List of guessing methods in the order guess_all applies them
         self.guess_methods_list = [
-            self.guess_common,
-            self.guess_type,
-            self.guess_io,
-            self.guess_DTYP,
-            self.guess_INP_OUT,
-            self.guess_SCAN,
-            self.guess_OZ_NAM,
-            self.guess_PREC,
-            self.guess_FTVL,
-            self.guess_NELM,
+            getattr(self, rule.method)
+            for rule in self.ordered_guess_rules()
         ]
         
         # use form list of dicts,1st list has 1 entry per requirement
@@ -598,17 +1699,9 @@ class BaseRecordPackage:
         self.validation_list = None
 
         # Load jinja templates
-        self.jinja_env = Environment(
-            loader = PackageLoader("pytmc","templates"),
-            trim_blocks = True,
-            lstrip_blocks = True,
-        )
-        self.record_template = self.jinja_env.get_template(
-            "asyn_standard_record.jinja2"
-        )
-        self.file_template = self.jinja_env.get_template(
-            "asyn_standard_file.jinja2"
-        )
+        self.jinja_env = get_jinja_env()
+        self.record_template = get_template("asyn_standard_record.jinja2")
+        self.file_template = get_template("asyn_standard_file.jinja2")
 
         self.ads_port = 851
         
@@ -641,6 +1734,107 @@ class BaseRecordPackage:
         """
         self.cfg = self.chain.naive_config()
 
+    def compact(self):
+        """
+        Produce a picklable form of this package holding its configuration
+        and what the guessing methods and templates read from its chain.
+        See :func:`~from_compact`.
+
+        Returns
+        -------
+        :class:`~pytmc.parallel.CompactPackage`
+        """
+        return parallel.CompactPackage(
+            package_class=type(self),
+            ads_port=self.ads_port,
+            chain=parallel.compact_chain(self.chain),
+            config=self.cfg.config,
+        )
+
+    @staticmethod
+    def from_compact(compact):
+        """
+        Rebuild a package from the output of :func:`~compact`. The chain of
+        the new package is the :class:`~pytmc.parallel.CompactChain`.
+
+        Parameters
+        ----------
+        compact : :class:`~pytmc.parallel.CompactPackage`
+
+        Returns
+        -------
+        BaseRecordPackage
+            Instance of the class the package was compacted from
+        """
+        pack = compact.package_class(chain=compact.chain)
+        pack.ads_port = compact.ads_port
+        pack.cfg = Configuration(config=list(compact.config))
+        return pack
+
+    def guess_signature(self):
+        """
+        Summarize everything the guessing methods depend on besides the PV
+        name and the variable path used by :func:`~INP_OUT_setting`. Packages
+        sharing a signature are guessed the same configuration lines, so
+        :func:`~apply_guesses` can reuse them. Requires
+        :func:`~generate_naive_config` to have been run first.
+
+        Returns
+        -------
+        tuple or None
+            Hashable signature, or None if this package can't share guesses
+        """
+        lines = []
+        for line in self.cfg.config:
+            title, tag = line['title'], line['tag']
+            if title == 'pv':
+                tag = None
+            elif type(tag) is dict:
+                tag = tuple(tag.items())
+            lines.append((title, tag))
+
+        last = self.chain.last
+        signature = (
+            type(self),
+            self.ads_port,
+            last.tc_type,
+            last.is_array,
+            last.is_str,
+            last.iterable_length,
+            tuple(lines),
+        )
+        try:
+            hash(signature)
+        except TypeError:
+            return None
+        return signature
+
+    def apply_guesses(self, guessed_lines):
+        """
+        Add the configuration lines :func:`~guess_all` produced for another
+        package with the same :func:`~guess_signature`, instead of guessing
+        again. The INP or OUT field is rebuilt for this package.
+
+        Parameters
+        ----------
+        guessed_lines : list
+            Configuration lines added to the other package by
+            :func:`~guess_all`
+        """
+        added = []
+        for line in guessed_lines:
+            tag = line['tag']
+            if type(tag) is dict:
+                tag = dict(tag)
+            self.cfg.add_config_line(line['title'], tag)
+            added.append(self.cfg.config[-1])
+
+        field_type, final_str = self.INP_OUT_setting()
+        for line in added:
+            if (line['title'] == 'field'
+                    and line['tag']['f_name'] == field_type):
+                line['tag']['f_set'] = final_str
+
     def ID_type(self):
         """
         Distinguish special record types from one another such as a motor
@@ -741,6 +1935,24 @@ class BaseRecordPackage:
         """
         raise NotImplementedError
         
+    def epics_type(self, io=None):
+        """
+        Look up how the last element of the chain is represented in EPICS.
+        See :func:`~pytmc.beckhoff.lookup_epics_type`.
+
+        Parameters
+        ----------
+        io : str, optional
+            Tag of the io configuration line
+
+        Returns
+        -------
+        :class:`~pytmc.beckhoff.EpicsType`
+        """
+        return lookup_epics_type(
+            self.chain.last.tc_type, self.chain.last.is_array, io
+        )
+
     def guess_common(self):
         """
         Add fields that are common to all records (PINI, TSE)
@@ -774,69 +1986,13 @@ class BaseRecordPackage:
         except ValueError:
             return False
     
-        # must be tested first, arrays will have the tc_type of the iterable:
-        if self.chain.last.is_array:
-            [io] =  self.cfg.get_config_lines('io')
-            if 'i' in io['tag'] and 'o' in io['tag']:
-                self.cfg.add_config_line("type", "waveform")
-                return True
-            elif 'i' in io['tag']:
-                self.cfg.add_config_line("type","waveform")
-                return True
-            elif 'o' in io['tag']:
-                self.cfg.add_config_line("type","waveform")
-                return True
-
-        bi_bo_set = {
-            "BOOL"
-        }
-        if self.chain.last.tc_type in bi_bo_set:
-            [io] =  self.cfg.get_config_lines('io')
-            if 'i' in io['tag'] and 'o' in io['tag']:
-                self.cfg.add_config_line("type", "bo")
-                return True
-            elif 'i' in io['tag']:
-                self.cfg.add_config_line("type","bi")
-                return True
-            elif 'o' in io['tag']:
-                self.cfg.add_config_line("type","bo")
-                return True
-        
-        ai_ao_set = {
-            "INT",
-            "DINT",
-            "REAL",
-            "LREAL",
-            "ENUM",
-        }
-        if self.chain.last.tc_type in ai_ao_set:
-            [io] =  self.cfg.get_config_lines('io')
-            if 'i' in io['tag'] and 'o' in io['tag']:
-                self.cfg.add_config_line("type", "ao")
-                return True
-            elif 'i' in io['tag']:
-                self.cfg.add_config_line("type","ai")
-                return True
-            elif 'o' in io['tag']:
-                self.cfg.add_config_line("type","ao")
-                return True
-
-        waveform_set = {
-            "STRING",
-        }
-        if self.chain.last.tc_type in waveform_set:
-            [io] =  self.cfg.get_config_lines('io')
-            if 'i' in io['tag'] and 'o' in io['tag']:
-                self.cfg.add_config_line("type", "waveform")
-                return True
-            elif 'i' in io['tag']:
-                self.cfg.add_config_line("type","waveform")
-                return True
-            elif 'o' in io['tag']:
-                self.cfg.add_config_line("type","waveform")
-                return True
+        record_type = self.epics_type(io['tag']).record_type
+        if record_type is None:
+            return False
+
+        self.cfg.add_config_line("type", record_type)
+        return True
 
-        return False
 
     def guess_io(self):
         """
@@ -877,107 +2033,13 @@ class BaseRecordPackage:
             pass
         
         [io] =  self.cfg.get_config_lines('io')
-        io = io['tag'] 
-        
-        BOOL_set = {"BOOL"}
-        if self.chain.last.tc_type in BOOL_set:
-            base = '"asynInt32'
-            if self.chain.last.is_array:
-                if 'i' in io and 'o' in io:
-                    self.cfg.add_config_field("DTYP",'"asynInt8ArrayOut"')
-                    return True
-                elif 'i' in io:
-                    self.cfg.add_config_field("DTYP",'"asynInt8ArrayIn"')
-                    return True
-                elif 'o' in io:
-                    self.cfg.add_config_field("DTYP",'"asynInt8ArrayOut"')
-                    return True
-            else:
-                self.cfg.add_config_field("DTYP", base+'"')
-                return True
-
-        INT_set = {"INT", "ENUM"}
-        if self.chain.last.tc_type in INT_set:
-            base = '"asynInt32'
-            if self.chain.last.is_array:
-                if 'i' in io and 'o' in io:
-                    self.cfg.add_config_field("DTYP",'"asynInt16ArrayOut"')
-                    return True
-                elif 'i' in io:
-                    self.cfg.add_config_field("DTYP",'"asynInt16ArrayIn"')
-                    return True
-                elif 'o' in io:
-                    self.cfg.add_config_field("DTYP",'"asynInt16ArrayOut"')
-                    return True
-            else:
-                self.cfg.add_config_field("DTYP", base+'"')
-                return True
-        
-        DINT_set = {"DINT"}
-        if self.chain.last.tc_type in DINT_set:
-            base = '"asynInt32'
-            if self.chain.last.is_array:
-                if 'i' in io and 'o' in io:
-                    self.cfg.add_config_field("DTYP",base+'ArrayOut"')
-                    return True
-                elif 'i' in io:
-                    self.cfg.add_config_field("DTYP",base+'ArrayIn"')
-                    return True
-                elif 'o' in io:
-                    self.cfg.add_config_field("DTYP",base+'ArrayOut"')
-                    return True
-            else:
-                self.cfg.add_config_field("DTYP", base+'"')
-                return True
-        
-        REAL_set = {"REAL"}
-        if self.chain.last.tc_type in REAL_set:
-            base = '"asynFloat32'
-            if self.chain.last.is_array:
-                if 'i' in io and 'o' in io:
-                    self.cfg.add_config_field("DTYP",base+'ArrayOut"')
-                    return True
-                elif 'i' in io:
-                    self.cfg.add_config_field("DTYP",base+'ArrayIn"')
-                    return True
-                elif 'o' in io:
-                    self.cfg.add_config_field("DTYP",base+'ArrayOut"')
-                    return True
-            else:
-                self.cfg.add_config_field("DTYP", base+'"')
-                return True
-        
-        LREAL_set = {"LREAL"}
-        if self.chain.last.tc_type in LREAL_set:
-            base = '"asynFloat64'
-            if self.chain.last.is_array:
-                if 'i' in io and 'o' in io:
-                    self.cfg.add_config_field("DTYP",base+'ArrayOut"')
-                    return True
-                elif 'i' in io:
-                    self.cfg.add_config_field("DTYP",base+'ArrayIn"')
-                    return True
-                elif 'o' in io:
-                    self.cfg.add_config_field("DTYP",base+'ArrayOut"')
-                    return True
-            else:
-                self.cfg.add_config_field("DTYP", base+'"')
-                return True
+        dtyp = self.epics_type(io['tag']).DTYP
+        if dtyp is None:
+            return False
+
+        self.cfg.add_config_field("DTYP", dtyp)
+        return True
 
-        asynInt8ArrayOut_set = {"STRING"}
-        if self.chain.last.tc_type in asynInt8ArrayOut_set:
-            [io] =  self.cfg.get_config_lines('io')
-            if 'i' in io['tag'] and 'o' in io['tag']:
-                self.cfg.add_config_field("DTYP", '"asynInt8ArrayOut"')
-                return True
-            elif 'i' in io['tag']:
-                self.cfg.add_config_field("DTYP", '"asynInt8ArrayIn"')
-                return True
-            elif 'o' in io['tag']:
-                self.cfg.add_config_field("DTYP", '"asynInt8ArrayOut"')
-                return True
-
-        return False 
 
     def guess_INP_OUT(self):
         """
@@ -990,7 +2052,27 @@ class BaseRecordPackage:
         bool
             Return a boolean that is true iff a change has been made.
         """
+        field_type, final_str = self.INP_OUT_setting()
+        
+        try:
+            [res] =  self.cfg.get_config_fields(field_type)
+            return False
+        except ValueError:
+            pass
+
+        self.cfg.add_config_field(field_type, final_str)
+        return True
+
+    def INP_OUT_setting(self):
+        """
+        Construct the INP or OUT field for this package without adding it.
+        See :func:`~guess_INP_OUT`.
 
+        Returns
+        -------
+        tuple
+            The field name ('INP' or 'OUT') and its setting
+        """
         [io] =  self.cfg.get_config_lines('io')
         io = io['tag']
         name_list = self.chain.name_list
@@ -1020,15 +2102,7 @@ class BaseRecordPackage:
             name = name,
             symbol = assign_symbol,
         )
-        
-        try:
-            [res] =  self.cfg.get_config_fields(field_type)
-            return False
-        except ValueError:
-            pass
-
-        self.cfg.add_config_field(field_type, final_str)
-        return True
+        return field_type, final_str
 
     def guess_SCAN(self):
         """
@@ -1046,25 +2120,14 @@ class BaseRecordPackage:
         except ValueError:
             pass
         [io] =  self.cfg.get_config_lines('io')
-        if 'i' in io['tag'] and 'o' in io['tag']:
-            self.cfg.add_config_field("SCAN", '"Passive"')
-            self.cfg.add_config_line("info",True)
-            return True
-            
-        elif 'i' in io['tag']:
-            fast_i_set = {'BOOL'}
-            if self.chain.last.tc_type in fast_i_set:
-                self.cfg.add_config_field("SCAN", '"I/O Intr"')
-                return True
-            else: 
-                self.cfg.add_config_field("SCAN", '".5 second"')
-                return True
-        elif 'o' in io['tag']:
-            self.cfg.add_config_field("SCAN", '"Passive"')
-            return True
-
+        scan = self.epics_type(io['tag']).SCAN
+        if scan is None:
+            return False
 
-        return False
+        self.cfg.add_config_field("SCAN", scan)
+        if io_direction(io['tag']) == 'io':
+            self.cfg.add_config_line("info",True)
+        return True
     
     ### guess lines below this comment are not always used (context specific)
 
@@ -1129,25 +2192,10 @@ class BaseRecordPackage:
         except ValueError:
             pass
 
-        if self.chain.last.is_array:
-            tc_type = self.chain.last.tc_type
-            if tc_type == "BOOL":
-                self.cfg.add_config_field("FTVL", '"CHAR"')
-                return True
-            INT_set = {"INT", "ENUM"}
-            if tc_type in INT_set:
-                self.cfg.add_config_field("FTVL", '"SHORT"')
-                return True
-            DINT_set = {"DINT"}
-            if tc_type in DINT_set:
-                self.cfg.add_config_field("FTVL", '"LONG"')
-                return True
-            if tc_type == "REAL":
-                self.cfg.add_config_field("FTVL", '"FLOAT"')
-                return True
-            if tc_type == "LREAL":
-                self.cfg.add_config_field("FTVL", '"DOUBLE"')
-                return True
+        ftvl = self.epics_type().FTVL
+        if ftvl is not None:
+            self.cfg.add_config_field("FTVL", ftvl)
+            return True
 
         if self.chain.last.is_str:
             self.cfg.add_config_field("FTVL", '"CHAR"')
@@ -1155,6 +2203,7 @@ class BaseRecordPackage:
 
         return False
 
+
     def guess_NELM(self):
         """
         Add data length secification for waveforms
@@ -1172,20 +2221,37 @@ class BaseRecordPackage:
 
         return False
 
+    @classmethod
+    def ordered_guess_rules(cls):
+        """
+        Provide :attr:`~guess_rules` in the order they are applied. Computed
+        once per class.
+
+        Returns
+        -------
+        list
+            :class:`~GuessRule` instances, see :func:`~order_rules`
+        """
+        if '_ordered_guess_rules' not in cls.__dict__:
+            cls._ordered_guess_rules = order_rules(cls.guess_rules)
+        return cls._ordered_guess_rules
+
     def guess_all(self):
         """
-        Cycle through guessing methods until none can be applied.
-        guessing methods is a list of functions. 
-        """
-        complete = False
-        count = 0
-        while not complete:
-            count += 1 
-            assert count < 20
-            complete = True
-            for method in self.guess_methods_list:
-                if method() == True:
-                    complete = False
+        Apply each guessing method once. Methods run after any method writing
+        the configuration they read, see :func:`~ordered_guess_rules`.
+
+        Returns
+        -------
+        collections.Counter
+            The number of times each guessing method made a change, keyed by
+            method name
+        """
+        fired = Counter()
+        for method in self.guess_methods_list:
+            if method() == True:
+                fired[method.__name__] += 1
+        return fired
 
     def render_to_string(self):
         """
@@ -7,8 +7,10 @@ variables and data structures found in the xml (tmc) formatted file.
 import logging
 logger = logging.getLogger(__name__)
 import xml.etree.ElementTree as ET
-from collections import defaultdict
+from collections import defaultdict, OrderedDict as odict
+import functools
 import re
+import weakref
 
 
 class XmlObjError(Exception):
@@ -23,6 +25,86 @@ class PvNotFrozenError(XmlObjError):
     pass
 
 
+class DetachedError(XmlObjError):
+    pass
+
+
+class _ElementToken:
+    """
+    Identifies the xml element a BaseElement was read from, even once
+    detached. Every instance read from the same element holds the same token.
+    Tokens pickled together stay shared once unpickled.
+    """
+    __slots__ = ('__weakref__',)
+
+
+_element_tokens = weakref.WeakKeyDictionary()
+
+
+def _element_token(element):
+    """
+    Find the :class:`~_ElementToken` of an xml element, creating it on the
+    first read of the element
+    """
+    token = _element_tokens.get(element)
+    if token is None:
+        token = _element_tokens[element] = _ElementToken()
+    return token
+
+_string_finder = re.compile(r"(?P<type>STRING)\((?P<count>[0-9]+)\)")
+
+# Number of distinct pragma strings kept parsed by Configuration
+PRAGMA_CACHE_SIZE = 4096
+
+# Number of ConfigurationLayers kept for reuse by sibling chains
+LAYER_CACHE_SIZE = 4096
+
+# A pragma line runs from its first character up to the next ';', newline or
+# carriage return, or to the end of the pragma. The delimiter is consumed.
+_pragma_line_finder = re.compile(r"(?P<line>[^\n][^;\n\r]*)(?:[;\n\r]|\Z)")
+_pragma_title_finder = re.compile(r"(?P<title>[\S]+):(?:[^\S]*)(?P<tag>.*)")
+_pragma_field_finder = re.compile(r"(?P<f_name>[\S]+)(?:[^\S]*)(?P<f_set>.*)")
+
+
+def _mutator(name):
+    """
+    Wrap a method of list so it bumps ConfigLines.version
+    """
+    method = getattr(list, name)
+
+    @functools.wraps(method)
+    def mutate(self, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+    return mutate
+
+
+class ConfigLines(list):
+    """
+    List of the configuration lines of a :class:`~Configuration`. Every
+    change to the list bumps :attr:`~version`, which tells the Configuration
+    when its lookup indices are out of date.
+
+    The title of a line and the name of a field line must not be edited in
+    place; replace the line instead, e.g. ``config[i] = {...}``.
+    """
+    # Number of changes made to the list
+    version = 0
+
+    __setitem__ = _mutator('__setitem__')
+    __delitem__ = _mutator('__delitem__')
+    __iadd__ = _mutator('__iadd__')
+    __imul__ = _mutator('__imul__')
+    append = _mutator('append')
+    extend = _mutator('extend')
+    insert = _mutator('insert')
+    pop = _mutator('pop')
+    remove = _mutator('remove')
+    clear = _mutator('clear')
+    sort = _mutator('sort')
+    reverse = _mutator('reverse')
+
+
 class Configuration:
     def __init__(self, in_str=None, config=None):
         """
@@ -38,6 +120,66 @@ class Configuration:
         self.cfg_header = 'pv'
         self.cfg_skip = 'skip'
 
+    @property
+    def config(self):
+        """
+        List of line-by-line dictionaries for the configuration, held as a
+        :class:`~ConfigLines`. Lookups by title and field name go through
+        indices kept alongside this list and rebuilt whenever the list
+        changes. Assigning a plain list stores a ConfigLines copy of it. Edit
+        the title or field name of a line by replacing the line, or through
+        :func:`~add_config_line`, not in place.
+        """
+        return self._config
+
+    @config.setter
+    def config(self, config):
+        if type(config) is not ConfigLines:
+            config = ConfigLines(config)
+        self._config = config
+        self._title_index = None
+        self._field_index = None
+        self._indexed_version = None
+
+    def _line_index(self):
+        """
+        Map each title to its lines in :attr:`~config`, preserving order. The
+        index is rebuilt if the list changed without going through
+        :func:`~add_config_line`.
+
+        Returns
+        -------
+        dict
+            Lists of configuration lines keyed by title
+        """
+        if (self._title_index is None
+                or self._indexed_version != self._config.version):
+            index = {}
+            for line in self._config:
+                index.setdefault(line['title'], []).append(line)
+            self._title_index = index
+            self._field_index = None
+            self._indexed_version = self._config.version
+        return self._title_index
+
+    def _field_name_index(self):
+        """
+        Map each field name to its field lines in :attr:`~config`, preserving
+        order.
+
+        Returns
+        -------
+        dict
+            Lists of field lines keyed by f_name
+        """
+        title_index = self._line_index()
+        if self._field_index is None:
+            index = {}
+            for line in title_index.get('field', ()):
+                index.setdefault(line['tag']['f_name'], []).append(line)
+            self._field_index = index
+        return self._field_index
+
     @property
     def raw_config(self):
         """
@@ -45,6 +187,29 @@ class Configuration:
         """
         return self._raw_config
 
+    @staticmethod
+    def parse_cache_info():
+        """
+        Report the usage of the pragma parsing cache shared by all
+        Configurations.
+
+        Returns
+        -------
+        functools._CacheInfo
+            Named tuple with the hits, misses, maxsize and currsize of the
+            cache
+        """
+        return _parse_config.cache_info()
+
+    @staticmethod
+    def clear_parse_cache():
+        """
+        Empty the pragma parsing cache shared by all Configurations and reset
+        its statistics.
+        """
+        _parse_config.cache_clear()
+        _parse_config_by_name.cache_clear()
+
     def _config_lines(self, raw_config=None):
         """
         Return dictionaries for each line. 
@@ -65,38 +230,10 @@ class Configuration:
         if raw_config is None:
             raw_config = self._raw_config
 
-        # Select special delimiter sequences and prepare them for re injection
-        line_term_seqs = [r";",r";;",r"[\n\r]",r"$"]
-        flex_term_regex = "|".join(line_term_seqs)
-
-
-        # Break configuration str into list of lines paired w/ their delimiters 
-        line_finder = re.compile(
-            r"(?P<line>.+?)(?P<delim>"+flex_term_regex+")"
-        )
-        conf_lines = [m.groupdict() for m in line_finder.finditer(raw_config)]
-        
-        # create list of lines information only. Strip out delimiters
-        result_no_delims = [r["line"] for r in conf_lines]
-
-        # erase any empty lines
-        result_no_delims = [
-            x for x in result_no_delims if x.strip() != ''
+        return [
+            {'title': title, 'tag': tag}
+            for title, tag in _tokenize_pragma(raw_config, neaten=False)
         ]
-
-        # Break lines into list of dictionaries w/ title/tag structure
-        line_parser = re.compile(
-            r"(?P<title>[\S]+):(?:[^\S]*)(?P<tag>.*)"
-        )
-        result = [
-            line_parser.search(m).groupdict() for m in result_no_delims
-        ]
-
-        # Strip out extra whitespace in the tag
-        for line in result:
-            line['tag'] = line['tag'].strip()
-        
-        return result
         
     def _neaten_field(self, string):
         """
@@ -113,10 +250,7 @@ class Configuration:
             Keys are 'f_name' for the field name and 'f_set' for the
             corresponding setting.
         """
-        finder = re.compile(
-            r"(?P<f_name>[\S]+)(?:[^\S]*)(?P<f_set>.*)"
-        )
-        return finder.search(string).groupdict()
+        return _pragma_field_finder.search(string).groupdict()
 
     def _formatted_config_lines(self, config_lines=None): 
         """
@@ -140,7 +274,7 @@ class Configuration:
 
         """
         if config_lines is None:
-            config_lines = self._config_lines()
+            return _thaw_config(_parse_config(self._raw_config))
         
         for line in config_lines:
             if line['title'] == 'field':
@@ -202,7 +336,9 @@ class Configuration:
             None instead.
         """
         if formatted_config_lines is None:
-            formatted_config_lines = self._formatted_config_lines()
+            return _thaw_config(
+                _parse_config_by_name(self._raw_config).get(config_name, ())
+            )
                 
         specific_configs = self._config_by_name(formatted_config_lines)
 
@@ -231,7 +367,10 @@ class Configuration:
             List of strings of all configurations found
         """
         if formatted_config_lines is None:
-            formatted_config_lines = self.config
+            return [
+                line['tag']
+                for line in self._line_index().get(self.cfg_header, ())
+            ]
         specific_configs = self._config_by_name(formatted_config_lines)
         config_names_list = list()
         for specific_config in specific_configs:
@@ -257,6 +396,28 @@ class Configuration:
         """
         self.config = self._select_config_by_name(config_name)
 
+    def singular_copy(self, config_name):
+        """
+        Produce a new Configuration cut down to a single configuration. This
+        Configuration is left untouched.
+        Derived from _select_config_by_name
+
+        Parameters
+        ----------
+        config_name : str
+            Provide the name of the configuration to keep
+
+        Returns
+        -------
+        Configuration
+            Has the same raw_config as this Configuration and the config that
+            :func:`~fix_to_config_name` would produce.
+        """
+        return Configuration(
+            in_str=self._raw_config,
+            config=self._select_config_by_name(config_name)
+        )
+
     def add_config_line(self, title, tag, line_no=None, config=None,
                 overwrite=False):
         """
@@ -295,13 +456,30 @@ class Configuration:
             for line in self.get_config_lines(title):
                 if line['title'] == title:
                     line['tag'] = tag
+                    if title == 'field':
+                        self._field_index = None
                     return
         
+        indexed = (config is self._config and self._title_index is not None
+                   and self._indexed_version == config.version)
         if line_no is None:
             config.append(new_line)
         else:
             config.insert(line_no, new_line)
 
+        # Keep the indices in step with the list
+        if not indexed or line_no is not None:
+            return
+        self._title_index.setdefault(title, []).append(new_line)
+        self._indexed_version = config.version
+        if title == 'field' and self._field_index is not None:
+            if type(tag) is dict:
+                self._field_index.setdefault(tag['f_name'], []).append(
+                    new_line
+                )
+            else:
+                self._field_index = None
+
     def add_config_field(self, f_name, f_set, line_no=None, config=None,
                 overwrite=False):
         """
@@ -325,7 +503,8 @@ class Configuration:
             self.config.
 
         overwrite : bool
-            Defaults to False. If the line already exists, overwrite it. 
+            Defaults to False. If a field named f_name already exists, set it
+            to f_set in place instead of adding a line.
 
         Returns
         -------
@@ -333,16 +512,9 @@ class Configuration:
 
         """
         if overwrite:
-            for field in self.get_config_fields(f_name):
-                if line['tag']['f_set'] == f_set:
-                    self.add_config_line(
-                        title='field',
-                        tag={'f_set': f_set, 'f_name': f_name},
-                        line_no=line_no,
-                        config=config,
-                        overwrite=True
-                    )
-
+            for line in self.get_config_fields(f_name, config):
+                line['tag'] = {'f_set': f_set, 'f_name': f_name}
+                return
 
         self.add_config_line(
             title='field',
@@ -373,7 +545,7 @@ class Configuration:
             title. Preserves order.
         """
         if config is None:
-            config = self.config
+            return list(self._line_index().get(title, ()))
 
         results_list = []
         for line in config:
@@ -402,6 +574,8 @@ class Configuration:
             list contains all configuration line dictionaries with the proper
             title. Preserves order.
         """
+        if config is None:
+            return list(self._field_name_index().get(f_name, ()))
 
         results_list = []
         fields_list = self.get_config_lines('field',config)
@@ -459,14 +633,7 @@ class Configuration:
                     tag=title_base+line['tag'],
                     overwrite=True
                 )
-            # handle fields
-            elif line['title'] is 'field':
-                self.add_config_field(
-                    f_name=line['tag']['f_name'],
-                    f_set=line['tag']['f_set'],
-                    overwrite=True
-                )
-            # hanlde all normal lines
+            # hanlde all other lines, fields included: one line per title
             else:
                 self.add_config_line(
                     title = line['title'],
@@ -506,11 +673,216 @@ class Configuration:
         return results
 
 
+@functools.lru_cache(maxsize=PRAGMA_CACHE_SIZE)
+def _parse_config(raw_config):
+    """
+    Parse a raw pragma into the lines of
+    :func:`~Configuration._formatted_config_lines` in an immutable form.
+    Results are cached by the raw string so identical pragmas are only parsed
+    once.
+
+    Returns
+    -------
+    tuple
+        A (title, tag) pair for each line. Field tags are (f_name, f_set)
+        pairs.
+    """
+    return tuple(_tokenize_pragma(raw_config))
+
+
+def _tokenize_pragma(raw_config, neaten=True):
+    """
+    Break a raw pragma into its lines in a single pass, skipping blank lines
+    and stripping whitespace from each tag.
+
+    Parameters
+    ----------
+    raw_config : str
+        completely unformatted string from the configuration
+
+    neaten : bool, optional
+        If True, split the tag of each field line into its field name and
+        setting. Defaults to True.
+
+    Yields
+    ------
+    tuple
+        A (title, tag) pair for each line. When neatened, field tags are
+        (f_name, f_set) pairs.
+    """
+    for line_match in _pragma_line_finder.finditer(raw_config):
+        line = line_match.group('line')
+        if line.isspace():
+            continue
+        title, tag = _pragma_title_finder.search(line).group('title', 'tag')
+        tag = tag.strip()
+        if neaten and title == 'field':
+            tag = _pragma_field_finder.search(tag).group('f_name', 'f_set')
+        yield title, tag
+
+
+@functools.lru_cache(maxsize=PRAGMA_CACHE_SIZE)
+def _parse_config_by_name(raw_config):
+    """
+    Split the output of :func:`~_parse_config` into the lines belonging to
+    each configuration (Pv). Like
+    :func:`~Configuration._select_config_by_name`, only the first
+    configuration with a given name is kept.
+
+    Returns
+    -------
+    dict
+        Tuples of (title, tag) pairs keyed by configuration name. Must not be
+        modified.
+    """
+    by_name = {}
+    current = None
+    for title, tag in _parse_config(raw_config):
+        if title == 'pv':
+            current = []
+            by_name.setdefault(tag, current)
+        if current is not None:
+            current.append((title, tag))
+    return {name: tuple(lines) for name, lines in by_name.items()}
+
+
+def _thaw_config(parsed_config):
+    """
+    Build a new, mutable list of configuration lines from the output of
+    :func:`~_parse_config`.
+    """
+    result = []
+    for title, tag in parsed_config:
+        if type(tag) is tuple:
+            tag = {'f_name': tag[0], 'f_set': tag[1]}
+        result.append({'title': title, 'tag': tag})
+    return result
+
+
+class ConfigurationLayer:
+    """
+    Immutable result of folding :func:`~Configuration.concat` over a sequence
+    of configurations, starting from an empty Configuration. A layer is built
+    from its parent layer and the configuration laid over it. Layers are
+    cached by that pair so every chain sharing a prefix, e.g. the siblings
+    below one Symbol, reuses the same layers instead of concatenating again.
+
+    Layers are created with :func:`~overlay`, starting from
+    :attr:`~ConfigurationLayer.EMPTY`.
+    """
+    __slots__ = ('parent', 'lines')
+
+    def __init__(self, parent=None, lines=()):
+        self.parent = parent
+        # Ordered (title, tag) pairs, each title once. Field tags are stored
+        # as tuples of their items.
+        self.lines = lines
+
+    def overlay(self, configuration, cc_symbol=":"):
+        """
+        Lay a configuration over this layer, as this layer's configuration
+        would be concatenated with it.
+
+        Parameters
+        ----------
+        configuration : Configuration
+            The interior configuration. Must be singular or empty.
+
+        cc_symbol : str, optional
+            Separator added between the PVs. Defaults to ":".
+
+        Returns
+        -------
+        ConfigurationLayer or None
+            The new layer, or None if the configuration holds lines that
+            can't be reproduced by a layer. Use
+            :func:`~Configuration.concat` in that case.
+        """
+        frozen = _freeze_config(configuration.config)
+        if frozen is None:
+            return None
+        return _overlay_layer(self, frozen, cc_symbol)
+
+    def configuration(self):
+        """
+        Produce a new, mutable Configuration holding the lines of this layer
+
+        Returns
+        -------
+        Configuration
+        """
+        config = []
+        for title, tag in self.lines:
+            if type(tag) is tuple:
+                tag = dict(tag)
+            config.append({'title': title, 'tag': tag})
+        return Configuration(config=config)
+
+    def __repr__(self):
+        return "ConfigurationLayer({!r})".format(self.lines)
+
+
+ConfigurationLayer.EMPTY = ConfigurationLayer()
+
+
+def _freeze_config(config):
+    """
+    Turn configuration lines into a hashable tuple of (title, tag) pairs for
+    :func:`~_overlay_layer`. Returns None for tags that can't be frozen.
+    """
+    frozen = []
+    for line in config:
+        title = line['title']
+        tag = line['tag']
+        if type(tag) is dict:
+            tag = tuple(tag.items())
+        elif type(tag) is not str:
+            return None
+        frozen.append((title, tag))
+    frozen = tuple(frozen)
+    try:
+        hash(frozen)
+    except TypeError:
+        return None
+    return frozen
+
+
+@functools.lru_cache(maxsize=LAYER_CACHE_SIZE)
+def _overlay_layer(parent, frozen_config, cc_symbol):
+    """
+    Build the ConfigurationLayer for a frozen configuration laid over
+    parent, following the rules of :func:`~Configuration.concat`. Cached so
+    each distinct layer is only built once.
+    """
+    lines = odict(parent.lines)
+    config_names = [tag for title, tag in parent.lines if title == 'pv']
+    if not config_names:
+        title_base = ""
+    if len(config_names) == 1:
+        title_base = config_names[0]
+        if title_base[-1] != cc_symbol:
+            if title_base.strip() != "":
+                title_base = title_base + cc_symbol
+
+    for title, tag in frozen_config:
+        if title == 'pv':
+            lines[title] = title_base + tag
+        else:
+            lines[title] = tag
+
+    return ConfigurationLayer(parent, tuple(lines.items()))
+
+
 class BaseElement:
     '''
     Base class for representing variables as they appear in the .tmc (xml)
     format.
 
+    Everything pytmc needs from the xml element (name, types, array and string
+    information, properties) is read in a single pass at instantiation. After
+    that the element is only kept for reference and can be dropped with
+    :func:`~detach`.
+
     Parameters
     ----------
     element : xml.etree.ElementTree.Element
@@ -519,6 +891,31 @@ class BaseElement:
     base : str
         The prefix that will mark pragmas intended for pytmc's consumption.
     '''
+    __slots__ = (
+        'element',
+        'com_base',
+        'pragma',
+        'tc_type_',
+        'is_array_',
+        '_string_info_',
+        'is_str_',
+        'iterable_length_',
+        'is_enum_',
+        '_cached_name',
+        '_uid',
+        '_name',
+        '_type',
+        '_base_type',
+        '_extends',
+        '_is_array',
+        '_array_length',
+        '_str_info',
+        '_properties',
+        '_has_enum_info',
+        '_has_subitem',
+        '_has_properties',
+    )
+
     def __init__(self, element, base=None, suffixes=None):
         if type(element) != ET.Element and element is not None:
             raise TypeError("ElementTree.Element required")
@@ -528,6 +925,7 @@ class BaseElement:
         self.iterable_length_ = None
         
         self.is_enum_ = None
+        self.tc_type_ = None
         
         self.element = element
         #self.registered_pragmas = []
@@ -550,6 +948,7 @@ class BaseElement:
 
         #self._pragma = None
         self._cached_name = None
+        self._read_element(element)
         
         # This is to allow testing without actual tmc elements 
         if element is None:
@@ -562,38 +961,90 @@ class BaseElement:
         else:
             self.pragma = Configuration(self.raw_config)
 
-    def _get_raw_properties(self):
+    def _read_element(self, element):
         """
-        Obtain all elements contained in the 'Properties' element. Intended for
-        internal use.
+        Extract all of the information used by pytmc from the xml element in
+        a single pass over its children. Intended for internal use.
 
-        Returns
-        -------
-        [xml.etree.ElementTree.Element]
-            List of elements
+        Parameters
+        ----------
+        element : xml.etree.ElementTree.Element or None
+            The element to read. If None, the defaults for an empty element
+            are used.
         """
-        return self.element.findall("./Properties/*")
+        self._uid = None
+        self._name = None
+        self._type = None
+        self._base_type = None
+        self._extends = None
+        self._is_array = False
+        self._array_length = None
+        self._str_info = (False, None)
+        self._properties = {}
+        self._has_enum_info = False
+        self._has_subitem = False
+        self._has_properties = False
 
-    @property
-    def properties(self):
+        if element is None:
+            return
+
+        self._uid = _element_token(element)
+
+        # Only the first instance of each field is used, matching find()
+        for child in element:
+            tag = child.tag
+            if tag == 'Name':
+                if self._name is None:
+                    self._name = child.text
+            elif tag == 'Type':
+                if self._type is None:
+                    self._type = child.text
+            elif tag == 'BaseType':
+                if self._base_type is None:
+                    self._base_type = child.text
+            elif tag == 'ExtendsType':
+                if self._extends is None:
+                    self._extends = child.text
+            elif tag == 'ArrayInfo':
+                if not self._is_array:
+                    self._is_array = True
+                    elements = child.find('./Elements')
+                    if elements is not None:
+                        self._array_length = int(elements.text)
+            elif tag == 'EnumInfo':
+                self._has_enum_info = True
+            elif tag == 'SubItem':
+                self._has_subitem = True
+            elif tag == 'Properties':
+                if not self._has_properties:
+                    self._has_properties = True
+                    self._properties = self._read_properties(child)
+
+        if self._base_type is not None:
+            result = _string_finder.search(self._base_type)
+            if result is not None:
+                self._str_info = (True, int(result['count']))
+
+    @staticmethod
+    def _read_properties(properties_element):
         """
-        Produce a dictionary of lists for the properties associated with this
-        element. The value of the dictionary is a list allowing for multiple
-        properties w/ the same name.
+        Produce the dictionary of properties held by a 'Properties' element.
+        Intended for internal use.
+
+        Parameters
+        ----------
+        properties_element : xml.etree.ElementTree.Element
+            The 'Properties' element
 
         Returns
         -------
         dict
-            Dictionary. The key is the property name and the value is a list of
-            values found in the xml
+            Dictionary. The key is the property name and the value is the
+            value found in the xml
         """
-        raw = self._get_raw_properties()
-        if raw is None:
-            return None
-
         result = {}
 
-        for entry in raw:
+        for entry in properties_element:
             name_element = entry.find("./Name")
             if name_element is None:
                 logger.debug("Property Name not found")
@@ -611,6 +1062,117 @@ class BaseElement:
 
         return result
 
+    def detach(self):
+        """
+        Release the xml element backing this instance. All of the information
+        pytmc uses has already been read, so the ElementTree can be freed once
+        every instance created from it has been detached. Instances read from
+        the same element remain equal.
+        """
+        self.element = None
+
+    def content_key(self):
+        """
+        Summarize everything pytmc read from the xml element. Elements with
+        equal keys produce the same records, as long as the DataTypes they
+        refer to are unchanged as well.
+
+        Returns
+        -------
+        tuple
+            Built from strings, numbers, booleans and None only
+        """
+        return (
+            type(self).__name__,
+            self._name,
+            self._type,
+            self._base_type,
+            self._extends,
+            self._is_array,
+            self._array_length,
+            self._str_info,
+            tuple(sorted(self._properties.items())),
+            self._has_enum_info,
+            self._has_subitem,
+            self._has_properties,
+        )
+
+    @property
+    def type_names(self):
+        """
+        Names of the types the xml element refers to in its 'Type',
+        'BaseType' and 'ExtendsType' fields, unaffected by enum resolution.
+
+        Returns
+        -------
+        list
+            Type names, in that order, skipping the missing fields
+        """
+        return [
+            name for name in (self._type, self._base_type, self._extends)
+            if name is not None
+        ]
+
+    def __getstate__(self):
+        """
+        Pickle this instance as if it had been detached, so the xml element
+        is never serialized.
+        """
+        state = {}
+        for cls in type(self).__mro__:
+            for slot in cls.__dict__.get('__slots__', ()):
+                if slot.startswith('__'):
+                    slot = '_' + cls.__name__.lstrip('_') + slot
+                if hasattr(self, slot):
+                    state[slot] = getattr(self, slot)
+        state['element'] = None
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore a pickled instance. It is equal to the instances pickled
+        along with it that were read from the same element, and to no other.
+        """
+        for slot, value in state.items():
+            object.__setattr__(self, slot, value)
+
+    def _get_raw_properties(self):
+        """
+        Obtain all elements contained in the 'Properties' element. Intended for
+        internal use.
+
+        Returns
+        -------
+        [xml.etree.ElementTree.Element]
+            List of elements. Empty if this instance was built without an
+            element.
+
+        Raises
+        ------
+        DetachedError
+            If this instance has been detached from its element
+        """
+        if self.element is None:
+            if self._uid is None:
+                return []
+            raise DetachedError("{!r} has been detached".format(self))
+        return self.element.findall("./Properties/*")
+
+    @property
+    def properties(self):
+        """
+        Produce a dictionary of lists for the properties associated with this
+        element. The value of the dictionary is a list allowing for multiple
+        properties w/ the same name.
+
+        Returns
+        -------
+        dict
+            Dictionary. The key is the property name and the value is a list of
+            values found in the xml
+        """
+        return self._properties
+
     @property
     def raw_config(self):
         """
@@ -625,7 +1187,7 @@ class BaseElement:
             such pragma can be found
 
         """
-        return self.properties.get('pytmc')
+        return self._properties.get('pytmc')
 
     @property
     def has_config(self):
@@ -662,11 +1224,19 @@ class BaseElement:
 
         xml.etree.ElementTree.Element or list(xml...Element) or None
             Return the first element found, the list of all elements found. If
-            the element is not found None or [] is returned for single-find or
-            find-all respectively.
+            the element is not found, or this instance was built without an
+            element, None or [] is returned for single-find or find-all
+            respectively.
+
+        Raises
+        ------
+        DetachedError
+            If this instance has been detached from its element
         """
         if self.element is None:
-            return None
+            if self._uid is None:
+                return [] if get_all else None
+            raise DetachedError("{!r} has been detached".format(self))
         if get_all:
             target_element = self.element.findall("./"+field_target)
         else:
@@ -674,6 +1244,21 @@ class BaseElement:
 
         return target_element
 
+    @property
+    def tc_type(self):
+        """
+        The type of the data this element represents. Overridden by
+        :class:`~pytmc.Symbol` and :class:`~pytmc.SubItem`.
+        """
+        return self.tc_type_
+
+    @tc_type.setter
+    def tc_type(self, new_data):
+        """
+        Make setable for tests
+        """
+        self.tc_type_ = new_data
+
     @property
     def is_array(self):
         """
@@ -686,11 +1271,7 @@ class BaseElement:
         """
         if self.is_array_ is not None:
             return self.is_array_
-        if self.element is None:
-            return False
-        if None != self._get_subfield('ArrayInfo'):
-            return True
-        return False
+        return self._is_array
     
     @is_array.setter
     def is_array(self, new_data):
@@ -712,18 +1293,7 @@ class BaseElement:
         """
         if self._string_info_ is not None:
             return self._string_info_
-        
-        base_type = self._get_subfield('BaseType')
-        if base_type is None:
-            return False, None
-        base_type_str = base_type.text
-
-        finder = re.compile(r"(?P<type>STRING)\((?P<count>[0-9]+)\)")
-        result = finder.search(base_type_str)
-        if result is None:
-            return False, None
-        if result['type'] == "STRING":
-            return True, int(result['count'])
+        return self._str_info
     
     @_string_info.setter
     def _string_info(self, new_data):
@@ -749,9 +1319,7 @@ class BaseElement:
             is_str, str_len = self._string_info
             return str_len
         if self.is_array:
-            response_string = self._get_subfield('ArrayInfo/Elements')
-            logger.debug("text:" + str(response_string.text))
-            return int(response_string.text)
+            return self._array_length
     
     @iterable_length.setter
     def iterable_length(self, new_data):
@@ -772,8 +1340,6 @@ class BaseElement:
         """
         if self.is_str_ is not None:
             return self.is_str_
-        if self.element is None:
-            return False
         is_str, str_len = self._string_info
         return is_str
     
@@ -787,23 +1353,18 @@ class BaseElement:
     def __eq__(self, other):
         '''
         Two objects are equal if they point to the same xml element. e.g. their
-        element fields point to the same place in the same file.
+        element fields point to the same place in the same file. This holds
+        once they have been detached.
         '''
-        if (type(other) != BaseElement
-                and type(other) != Symbol
-                and type(other) != DataType
-                and type(other) != SubItem):
-            return False
-        if self.element == other.element:
-            return True
-        else:
-            return False
+        if not isinstance(other, BaseElement):
+            return NotImplemented
+        return self._uid is other._uid
 
     def __repr__(self):
-        if self.element is None:
+        if self._name is None:
             name = "None"
         else:
-            name = "<xml(" + self.element.find("./Name").text + ")>"
+            name = "<xml(" + self._name + ")>"
             
         return "{}(element={})".format(
             self.__class__.__name__,
@@ -823,7 +1384,7 @@ class BaseElement:
             The name of the variable
         '''
         if self._cached_name is None:
-            return self._get_subfield("Name").text
+            return self._name
         else:
             return self._cached_name
 
@@ -855,6 +1416,8 @@ class Symbol(BaseElement):
     base : str
         The prefix that will mark pragmas intended for pytmc's consumption. 
     '''
+    __slots__ = ('is_enum',)
+
     def __init__(self, element, base=None,suffixes=None):
         super().__init__(element, base, suffixes)
         #self.registered_pragmas = [
@@ -884,8 +1447,7 @@ class Symbol(BaseElement):
             return "ENUM"
         if self.is_str:
             return "STRING"
-        name_field = self._get_subfield("BaseType")
-        return name_field.text
+        return self._base_type
 
 
 class DataType(BaseElement):
@@ -912,7 +1474,7 @@ class DataType(BaseElement):
     base : str
         The prefix that will mark pragmas intended for pytmc's consumption. 
     '''
-    children = []
+    __slots__ = ('children',)
     
     def __init__(self, element, base=None, suffixes=None):
         super().__init__(element, base, suffixes)
@@ -936,28 +1498,15 @@ class DataType(BaseElement):
         str
             Name of data type
         '''        
-        has_EnumInfo = False
-        has_SubItem = False
-        has_Properties = False
-
-        if None != self._get_subfield("EnumInfo"):
-            has_EnumInfo = True
-            
-        if None != self._get_subfield("SubItem"):
-            has_SubItem = True
-        
-        if None != self._get_subfield("Properties"):
-            has_Properties = True
-        
         result = None
 
-        if has_Properties:
+        if self._has_properties:
             result = "FunctionBlock"
         
-        if has_SubItem and not has_Properties:
+        if self._has_subitem and not self._has_properties:
             result = "Struct"
 
-        if has_EnumInfo:
+        if self._has_enum_info:
             result = "Enum"
 
         return result
@@ -978,10 +1527,7 @@ class DataType(BaseElement):
             DataType name or None if there is no parent 
 
         '''
-        extension_element = self._get_subfield("ExtendsType")
-        if extension_element == None:
-            return None
-        return extension_element.text
+        return self._extends
     
 
     @property
@@ -997,11 +1543,7 @@ class DataType(BaseElement):
         """
         if self.is_enum_ is not None:
             return self.is_enum_
-        if self.element is None:
-            return False
-        if None != self._get_subfield('EnumInfo'):
-            return True
-        return False
+        return self._has_enum_info
     
 
 class SubItem(BaseElement):
@@ -1035,6 +1577,8 @@ class SubItem(BaseElement):
     parent : :class:`~pytmc.xml_obj.baseElement`
         The DataStructure in which this SubItem appears
     '''
+    __slots__ = ('__parent', 'is_enum')
+
     def __init__(self, element, base=None, suffixes=None, parent = None):
         super().__init__(element, base, suffixes)
         #self.registered_pragmas = [
@@ -1068,8 +1612,7 @@ class SubItem(BaseElement):
             return "ENUM"
         if self.is_str:
             return "STRING"
-        name_field = self._get_subfield("Type")
-        return name_field.text
+        return self._type
 
     @property
     def parent(self):
@@ -17,4 +17,7 @@ setup(
         ]
     },
     include_package_data = True,
+    extras_require = {
+        'batch': ['numpy'],
+    },
 )
@@ -0,0 +1,133 @@
+import pytest
+import io
+import os
+import shutil
+import threading
+import time
+
+from pytmc import TmcFile
+from pytmc.bin.makerecord import read_manifest, run_batch, report_batch
+from pytmc.bin.makerecord import make_record, watch
+from pytmc.output import write_if_changed
+
+
+def test_write_if_changed(tmpdir):
+    path = str(tmpdir.join('out.db'))
+    assert write_if_changed(path, lambda f: f.write('abc'))
+    tmpdir.join('out.db').chmod(0o640)
+    mtime = os.stat(path).st_mtime_ns
+
+    assert not write_if_changed(path, lambda f: f.write('abc'))
+    assert os.stat(path).st_mtime_ns == mtime
+    assert write_if_changed(path, lambda f: f.write('abd'))
+    assert tmpdir.join('out.db').read() == 'abd'
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+    def fail(f):
+        f.write('partial')
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        write_if_changed(path, fail)
+    assert tmpdir.join('out.db').read() == 'abd'
+    assert tmpdir.listdir() == [tmpdir.join('out.db')]
+
+
+def test_make_record_changed(generic_tmc_path, tmpdir):
+    record_path = str(tmpdir.join('out.db'))
+    assert make_record(generic_tmc_path, record_path) == (True, None)
+    assert make_record(generic_tmc_path, record_path) == (False, None)
+    changed, previous = make_record(
+        generic_tmc_path, record_path, use_sidecar=True
+    )
+    assert not changed
+    assert previous
+    assert len(tmpdir.listdir()) == 2
+
+
+def test_make_record_batch(generic_tmc_path, tmpdir):
+    pytest.importorskip('numpy')
+    make_record(generic_tmc_path, str(tmpdir.join('serial.db')))
+    make_record(generic_tmc_path, str(tmpdir.join('batch.db')), batch=True)
+    assert tmpdir.join('batch.db').read() == tmpdir.join('serial.db').read()
+
+
+def test_read_manifest(tmpdir):
+    manifest = tmpdir.join('manifest.txt')
+    manifest.write(
+        "# PLCs\n"
+        "\n"
+        "a.tmc a.db\n"
+        "'with space.tmc'   /abs/b.db\n"
+    )
+    assert read_manifest(str(manifest)) == [
+        (str(tmpdir.join('a.tmc')), str(tmpdir.join('a.db'))),
+        (str(tmpdir.join('with space.tmc')), '/abs/b.db'),
+    ]
+
+    manifest.write("a.tmc\n")
+    with pytest.raises(ValueError):
+        read_manifest(str(manifest))
+
+
+def test_run_batch(generic_tmc_path, string_tmc_path, tmpdir):
+    pairs = [
+        (generic_tmc_path, str(tmpdir.join('generic.db'))),
+        (str(tmpdir.join('missing.tmc')), str(tmpdir.join('missing.db'))),
+        (string_tmc_path, str(tmpdir.join('string.db'))),
+    ]
+    results = run_batch(pairs, workers=2)
+
+    assert [result[:2] for result in results] == pairs
+    assert [result[4] is None for result in results] == [True, False, True]
+    assert [result[3] for result in results] == [True, False, True]
+    assert 'FileNotFoundError' in results[1][4]
+    for tmc_path, record_path, seconds, changed, error in results:
+        assert seconds >= 0
+        if error is None:
+            tmc = TmcFile(tmc_path)
+            tmc.create_chains()
+            tmc.isolate_chains()
+            tmc.create_packages()
+            tmc.configure_packages()
+            with open(record_path) as record_file:
+                assert record_file.read() == tmc.render()
+
+    report = io.StringIO()
+    assert report_batch(results, stream=report) == 1
+    assert report.getvalue().count('\n') == 4
+
+
+def test_watch(generic_tmc_path, tmpdir):
+    tmc_path = str(tmpdir.join('watched.tmc'))
+    record_path = str(tmpdir.join('watched.db'))
+    shutil.copy(generic_tmc_path, tmc_path)
+    report = io.StringIO()
+    watcher = threading.Thread(
+        target=watch,
+        args=(tmc_path, record_path),
+        kwargs=dict(
+            poll_interval=0.01, debounce=0.05, max_builds=2, output=report
+        ),
+    )
+    watcher.start()
+    deadline = time.time() + 10
+    while not report.getvalue() and time.time() < deadline:
+        time.sleep(0.01)
+
+    with open(tmc_path) as tmc_file:
+        content = tmc_file.read()
+    edited = content.replace('pv: STRUCT_VAR', 'pv: STRUCT_VAR_EDIT')
+    with open(tmc_path, 'w') as tmc_file:
+        tmc_file.write(edited)
+    watcher.join(10)
+
+    assert not watcher.is_alive()
+    assert report.getvalue().count('ok ') == 2
+    tmc = TmcFile(io.StringIO(edited))
+    tmc.create_chains()
+    tmc.isolate_chains()
+    tmc.create_packages()
+    tmc.configure_packages()
+    with open(record_path) as record_file:
+        assert record_file.read() == tmc.render()
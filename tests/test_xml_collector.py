@@ -1,15 +1,20 @@
 import pytest
+import io
 import logging
 import textwrap
 from copy import deepcopy
 import xml.etree.ElementTree as ET
 
 from pytmc import Symbol, DataType, SubItem
-from pytmc.xml_obj import BaseElement, Configuration
+from pytmc.xml_obj import BaseElement, Configuration, ConfigurationLayer
 
 from pytmc import TmcFile
 from pytmc.xml_collector import ElementCollector, TmcChain, BaseRecordPackage
-from pytmc.xml_collector import ChainNotSingularError
+from pytmc.xml_collector import ChainNotSingularError, ExplorationError
+from pytmc.xml_collector import get_template, use_template_cache
+from pytmc.xml_collector import GuessRule, RuleOrderError, order_rules
+from pytmc.beckhoff import beckhoff_types, EpicsType, lookup_epics_type
+from pytmc import incremental
 
 from collections import defaultdict, OrderedDict as odict
 
@@ -134,6 +139,52 @@ def test_TmcFile_isolate_all(generic_tmc_path):
     assert tmc.all_SubItems['DUT_CONTAINER']['dtype_enum'].is_enum
 
 
+def test_TmcFile_isolate_all_streaming(string_tmc_path):
+    tmc = TmcFile(string_tmc_path)
+    streamed = TmcFile(string_tmc_path, stream=True)
+
+    assert streamed.tree is None
+    assert streamed.root is None
+    assert streamed.all_Symbols['MAIN.ulimit'].element is None
+    assert list(streamed.all_Symbols) == list(tmc.all_Symbols)
+    assert list(streamed.all_DataTypes) == list(tmc.all_DataTypes)
+    for datatype_name in tmc.all_SubItems:
+        assert (list(streamed.all_SubItems[datatype_name])
+            == list(tmc.all_SubItems[datatype_name]))
+
+    assert streamed.all_Symbols['MAIN.dtype_samples_enum'].is_enum
+    assert streamed.all_Symbols['MAIN.StringTest'].iterable_length == 55
+
+    for t in [tmc, streamed]:
+        t.create_chains()
+        t.isolate_chains()
+        t.create_packages()
+        t.configure_packages()
+    assert streamed.render() == tmc.render()
+
+
+def test_TmcFile_isolate_reachable_DataTypes(generic_tmc_path):
+    tmc = TmcFile(generic_tmc_path, lazy=True)
+    eager = TmcFile(generic_tmc_path)
+    assert set(tmc.all_DataTypes) == set(eager.all_DataTypes)
+    assert tmc.all_SubItems['DUT_CONTAINER']['dtype_enum'].is_enum
+
+    tmc = TmcFile(generic_tmc_path)
+    tmc.all_Symbols = ElementCollector()
+    tmc.all_DataTypes = ElementCollector()
+    tmc.all_SubItems = defaultdict(ElementCollector)
+    tmc.isolate_Symbols()
+    for name in list(tmc.all_Symbols):
+        if name != 'MAIN.struct_extra':
+            del tmc.all_Symbols[name]
+
+    tmc.isolate_reachable_DataTypes()
+    assert set(tmc.all_DataTypes) == {'DUT_EXTENSION_STRUCT', 'DUT_STRUCT'}
+    assert list(tmc.all_SubItems['DUT_STRUCT']) == [
+        'struct_var', 'struct_var2'
+    ]
+
+
 def test_TmcFile_explore_all(generic_tmc_path):
     tmc = TmcFile(generic_tmc_path)
     tmc.isolate_all()
@@ -187,6 +238,79 @@ def test_TmcFile_recursive_explore(generic_tmc_path):
     ]
 
 
+def test_TmcFile_duplicate_DataType(generic_tmc_path):
+    with open(generic_tmc_path, encoding='utf-8-sig') as tmc_file:
+        content = tmc_file.read()
+    first = '<DataType><Name>DUT_ENUMTEST</Name>'
+    duplicate = (
+        '<DataType><Name>DUT_ENUMTEST</Name><BaseType>DINT</BaseType>'
+        '</DataType>'
+    )
+    content = content.replace(first, duplicate + first, 1)
+
+    keys = []
+    for stream in (False, True):
+        for lazy in (False, True):
+            tmc = TmcFile(io.StringIO(content), stream=stream, lazy=lazy)
+            keys.append(tmc.all_DataTypes['DUT_ENUMTEST'].content_key())
+    assert keys == [keys[0]] * 4
+    assert 'DINT' not in keys[0]
+
+
+def test_TmcFile_explore_all_prune(generic_tmc_path):
+    tmc = TmcFile(generic_tmc_path)
+    full_list = tmc.explore_all()
+    pruned_list = tmc.explore_all(prune=True)
+
+    assert len(pruned_list) < len(full_list)
+    assert pruned_list == [
+        row for row in full_list
+        if all(element.pragma is not None for element in row)
+    ]
+
+    root_path = [tmc.all_Symbols['TwinCAT_SystemInfoVarList._TaskInfo']]
+    assert tmc.recursive_explore(root_path) != []
+    assert tmc.recursive_explore(root_path, prune=True) == []
+
+    tmc.create_chains()
+    assert len(tmc.all_TmcChains) == len(full_list)
+
+
+def test_TmcFile_leaf_template(generic_tmc_path):
+    tmc = TmcFile(generic_tmc_path)
+    template = tmc.leaf_template('DUT_EXTENSION_STRUCT')
+    assert template == (
+        (tmc.all_SubItems['DUT_STRUCT']['struct_var'],),
+        (tmc.all_SubItems['DUT_STRUCT']['struct_var2'],),
+        (tmc.all_SubItems['DUT_EXTENSION_STRUCT']['tertiary'],),
+    )
+    assert tmc.leaf_template('DUT_EXTENSION_STRUCT') is template
+
+    tmc.clear_explore_cache()
+    assert tmc.leaf_template('DUT_EXTENSION_STRUCT') is not template
+
+
+def test_TmcFile_iter_explore_all(generic_tmc_path):
+    tmc = TmcFile(generic_tmc_path)
+    paths = tmc.iter_explore_all()
+    assert not isinstance(paths, list)
+    assert list(paths) == tmc.explore_all()
+
+
+def test_TmcFile_iter_explore_limits(generic_tmc_path):
+    tmc = TmcFile(generic_tmc_path)
+    root_path = [tmc.all_Symbols['MAIN.test_iterator']]
+    assert len(tmc.recursive_explore(root_path, max_depth=3)) > 0
+    with pytest.raises(ExplorationError):
+        tmc.recursive_explore(root_path, max_depth=2)
+
+    # Make a DataType hold an instance of itself
+    tmc.clear_explore_cache()
+    tmc.all_SubItems['DUT_STRUCT']['struct_var']._type = 'DUT_STRUCT'
+    with pytest.raises(ExplorationError):
+        tmc.recursive_explore(root_path)
+
+
 def test_TmcFile_recursive_list_SubItems(generic_tmc_path):
     tmc = TmcFile(generic_tmc_path)
     tmc.isolate_all()
@@ -430,6 +554,20 @@ def test_TmcChain_recursive_permute():
     ]
 
 
+def test_TmcChain_iter_permute():
+    l = [['a'],['b','c','d'],['e','f']]
+    chain = TmcChain(None)
+    result = chain._iter_permute(l)
+    assert next(result) == ('a', 'b', 'e')
+    assert next(result) == ('a', 'c', 'e')
+    assert list(result) == [
+        ('a', 'd', 'e'),
+        ('a', 'b', 'f'),
+        ('a', 'c', 'f'),
+        ('a', 'd', 'f'),
+    ]
+
+
 @pytest.mark.parametrize("use_base_pragma, answer_set",[
         (False, 0),
         (True, 1),
@@ -490,6 +628,38 @@ def test_TmcChain_build_singular_chains(use_base_pragma, generic_tmc_path,
         ]
 
 
+def test_TmcChain_build_singular_chains_shared(sample_TmcChain):
+    stem, leaf_a, leaf_b = sample_TmcChain.chain
+    response_set = sample_TmcChain.build_singular_chains()
+    assert len(response_set) == 4
+
+    for x in response_set:
+        assert x.chain[0].target is stem
+        assert x.chain[1].target is leaf_a
+        assert x.chain[2].target is leaf_b
+        assert x.chain == sample_TmcChain.chain
+
+    # The shared elements keep all of their configurations
+    assert leaf_a.pragma.config_names() == ['FIRST', 'SECOND']
+
+    # Attributes set on one chain do not leak into the others
+    response_set[0].last.tc_type = "BOOL"
+    response_set[0].last.name = "leaf"
+    assert response_set[0].last.tc_type == "BOOL"
+    assert response_set[0].last.name == "leaf"
+    assert response_set[2].last.tc_type is None
+    assert leaf_b.tc_type is None
+    assert leaf_b.name is None
+
+    # Properties derived from attributes set on a view follow the view
+    response_set[1].last._string_info = (True, 12)
+    assert response_set[1].last.is_str
+    assert response_set[1].last.iterable_length == 12
+    assert not response_set[3].last.is_str
+    assert leaf_b.iterable_length is None
+    assert not isinstance(response_set[1].last, BaseElement)
+
+
 @pytest.fixture(scope='function')
 def sample_TmcChain(generic_tmc_path, 
             leaf_bool_pragma_string, branch_bool_pragma_string,
@@ -524,6 +694,28 @@ def test_TmcChain_naive_config(sample_TmcChain):
     ]
 
 
+def test_TmcChain_naive_config_layers(generic_tmc_path):
+    tmc = TmcFile(generic_tmc_path)
+    tmc.create_chains()
+    tmc.isolate_chains()
+    for singular in tmc.all_singular_TmcChains:
+        legacy = Configuration(config=[])
+        for entry in singular.chain:
+            legacy.concat(entry.pragma)
+        assert singular.naive_config().config == legacy.config
+
+    # Siblings share the layer built for their common prefix
+    first, second = [
+        singular for singular in tmc.all_singular_TmcChains
+        if singular.chain[0].name == 'MAIN.struct_extra'
+    ][:2]
+    layer_a = ConfigurationLayer.EMPTY.overlay(first.chain[0].pragma)
+    layer_b = ConfigurationLayer.EMPTY.overlay(second.chain[0].pragma)
+    assert layer_a is layer_b
+    assert layer_a.overlay(first.chain[1].pragma) is not \
+        layer_b.overlay(second.chain[1].pragma)
+
+
 def test_TmcChain_name_list():
     stem = BaseElement(element=None)
     stem.name = "stem"
@@ -703,6 +895,28 @@ def test_BaseRecordPackage_guess_type(example_singular_tmc_chains,
     assert field['tag'] == final_type 
 
 
+def test_epics_types_cover_beckhoff_types():
+    for tc_type in beckhoff_types:
+        for is_array in (False, True):
+            for io in ('i', 'o', 'io'):
+                epics_type = lookup_epics_type(tc_type, is_array, io)
+                assert epics_type.record_type is not None
+                assert epics_type.SCAN is not None
+                if is_array:
+                    assert epics_type.record_type == 'waveform'
+                    assert epics_type.DTYP is not None
+
+    assert lookup_epics_type('UINT', True, 'input') == EpicsType(
+        'waveform', '"asynInt16ArrayIn"', '"USHORT"', '".5 second"'
+    )
+    assert lookup_epics_type('UDINT', False, 'o') == EpicsType(
+        'ao', '"asynInt32"', None, '"Passive"'
+    )
+    assert lookup_epics_type('DUT_CUSTOM', False, 'i') == EpicsType(
+        None, None, None, '".5 second"'
+    )
+
+
 @pytest.mark.parametrize("tc_type, sing_index, final_io",[
         ("BOOL", 6, 'io'),
         ("INT", 6, 'io'),
@@ -1002,3 +1216,252 @@ def test_BaseRecordPackage_guess_all(example_singular_tmc_chains, tc_type,
     [out] = record.cfg.get_config_fields(spot_check)
     assert out['tag']['f_set'] == result
 
+
+def test_TmcFile_configure_packages_memoize(generic_tmc_path):
+    configs = {}
+    counts = {}
+    for memoize in (False, True):
+        tmc = TmcFile(generic_tmc_path)
+        tmc.create_chains()
+        tmc.isolate_chains()
+        tmc.create_packages()
+        tmc.configure_packages(memoize=memoize)
+        configs[memoize] = [pack.cfg.config for pack in tmc.all_RecordPackages]
+        counts[memoize] = tmc.guess_rule_counts
+
+    assert configs[True] == configs[False]
+    assert counts[True] == counts[False]
+    assert tmc.guess_cache_hits > 0
+    assert tmc.guess_cache_hits + tmc.guess_cache_misses == len(configs[True])
+    assert 0 < tmc.guess_cache_hit_rate < 1
+
+
+def test_TmcFile_model_cache(generic_tmc_path, tmpdir):
+    db_strings = []
+    for expected_hit in (False, True):
+        tmc = TmcFile(generic_tmc_path, cache_dir=str(tmpdir))
+        assert tmc.cache_hit == expected_hit
+        assert (tmc.root is None) == expected_hit
+        tmc.create_chains()
+        tmc.isolate_chains()
+        tmc.create_packages()
+        tmc.configure_packages()
+        db_strings.append(tmc.render())
+
+    assert db_strings[0] == db_strings[1]
+
+    with open(generic_tmc_path) as tmc_file:
+        content = tmc_file.read()
+    tmc = TmcFile(io.StringIO(content + '\n'), cache_dir=str(tmpdir))
+    assert not tmc.cache_hit
+    tmc = TmcFile(generic_tmc_path, lazy=True, cache_dir=str(tmpdir))
+    assert not tmc.cache_hit
+    assert len(tmpdir.listdir()) == 3
+
+    tmc_path = tmpdir.mkdir('source').join('edited.tmc')
+    cache_dir = tmpdir.mkdir('cache')
+    for text in (content, content + '\n', content):
+        tmc_path.write(text)
+        with open(str(tmc_path)) as tmc_file:
+            tmc = TmcFile(tmc_file, cache_dir=str(cache_dir))
+        assert not tmc.cache_hit
+        assert len(cache_dir.listdir()) == 1
+    assert TmcFile(str(tmc_path), cache_dir=str(cache_dir)).cache_hit
+
+
+def test_TmcFile_shared_templates(generic_tmc_path):
+    with open(generic_tmc_path) as tmc_file:
+        content = tmc_file.read()
+    edited = content.replace('pv: STRUCT_VAR', 'pv: STRUCT_VAR_EDIT')
+    shared = odict()
+    first = TmcFile(io.StringIO(content))
+    first.shared_templates = shared
+    first.create_chains()
+    first_ids = {
+        id(element) for chain in first.all_TmcChains for element in chain.chain
+    }
+    assert shared
+
+    db_strings = []
+    for templates in (shared, None):
+        tmc = TmcFile(io.StringIO(edited))
+        tmc.shared_templates = templates
+        tmc.create_chains()
+        tmc.isolate_chains()
+        tmc.create_packages()
+        tmc.configure_packages()
+        db_strings.append(tmc.render())
+        reused = [
+            element for chain in tmc.all_TmcChains for element in chain.chain
+            if id(element) in first_ids
+        ]
+        assert bool(reused) == (templates is not None)
+        assert 'STRUCT_VAR_EDIT' not in repr([e.raw_config for e in reused])
+
+    assert db_strings[0] == db_strings[1]
+    assert 'STRUCT_VAR_EDIT' in db_strings[0]
+
+
+def test_TmcFile_content_hashes(generic_tmc_path):
+    with open(generic_tmc_path) as tmc_file:
+        content = tmc_file.read()
+    hashes = TmcFile(io.StringIO(content)).content_hashes()
+    assert hashes == TmcFile(generic_tmc_path).content_hashes()
+
+    edited = content.replace('pv: STRUCT_VAR', 'pv: STRUCT_VAR_EDIT')
+    tmc = TmcFile(io.StringIO(edited))
+    new_hashes = tmc.content_hashes()
+    assert list(new_hashes) == list(hashes)
+    changed = [name for name in hashes if hashes[name] != new_hashes[name]]
+    assert 'MAIN.struct_base' in changed
+    assert 'MAIN.struct_extra' in changed
+    assert len(changed) < len(hashes)
+
+
+def test_incremental_regenerate(generic_tmc_path, tmpdir):
+    with open(generic_tmc_path) as tmc_file:
+        content = tmc_file.read()
+    edited = content.replace('pv: STRUCT_VAR', 'pv: STRUCT_VAR_EDIT')
+    sidecar = str(tmpdir.join('out.db' + incremental.SIDECAR_SUFFIX))
+
+    previous = incremental.load_sidecar(sidecar)
+    assert previous == {}
+    for text in (content, content, edited):
+        tmc = TmcFile(io.StringIO(text))
+        hashes, records, changed = incremental.regenerate(tmc, previous)
+        incremental.store_sidecar(sidecar, hashes, records)
+        db_string = tmc.render(
+            records=[rec for recs in records.values() for rec in recs]
+        )
+
+        full = TmcFile(io.StringIO(text))
+        full.create_chains()
+        full.isolate_chains()
+        full.create_packages()
+        full.configure_packages()
+        assert db_string == full.render()
+
+        if previous:
+            assert len(changed) < len(hashes)
+        previous = incremental.load_sidecar(sidecar)
+
+    assert changed
+    assert 'STRUCT_VAR_EDIT' in db_string
+
+
+def test_TmcFile_render_to(generic_tmc_path):
+    tmc = TmcFile(generic_tmc_path)
+    tmc.create_chains()
+    tmc.isolate_chains()
+    tmc.create_packages()
+    tmc.configure_packages()
+    db_string = tmc.render()
+
+    stream = io.StringIO()
+    tmc.render_to(stream, buffer_size=100)
+    assert stream.getvalue() == db_string
+    assert ''.join(tmc.iter_render()) == db_string
+
+    rendered = []
+    for pack in tmc.all_RecordPackages:
+        pack.render_record = lambda pack=pack: rendered.append(pack) or ''
+    next(tmc.iter_render())
+    assert len(rendered) < len(tmc.all_RecordPackages)
+
+
+def test_TmcFile_workers(generic_tmc_path):
+    configs = {}
+    db_strings = {}
+    for workers in (None, 2):
+        tmc = TmcFile(generic_tmc_path)
+        tmc.create_chains()
+        tmc.isolate_chains()
+        tmc.create_packages()
+        tmc.configure_packages(workers=workers)
+        configs[workers] = [pack.cfg.config for pack in tmc.all_RecordPackages]
+        db_strings[workers] = tmc.render(workers=workers)
+
+    assert configs[2] == configs[None]
+    assert db_strings[2] == db_strings[None]
+
+
+@pytest.mark.parametrize("tc_type, is_array, is_str, io", [
+        ("BOOL", False, False, 'i'),
+        ("BOOL", True, False, 'o'),
+        ("INT", False, False, None),
+        ("LREAL", True, False, 'io'),
+        ("UDINT", False, False, 'input'),
+        ("STRING", False, True, 'io'),
+        ("DUT_CUSTOM", False, False, 'rw'),
+])
+def test_TmcFile_configure_packages_batch(example_singular_tmc_chains,
+            tc_type, is_array, is_str, io):
+    pytest.importorskip('numpy')
+    configs = {}
+    for batch in (False, True):
+        tmc = TmcFile(None)
+        for sing_index in (0, 2, 6):
+            chain = example_singular_tmc_chains[sing_index]
+            for idx, element in enumerate(chain.chain):
+                element.name = chr(97+idx)
+            chain.last.tc_type = tc_type
+            chain.last.is_array = is_array
+            chain.last.is_str = is_str
+            chain.last.iterable_length = 4
+            pack = BaseRecordPackage(chain)
+            pack.generate_naive_config = lambda pack=pack: None
+            pack.cfg = chain.naive_config()
+            if io is not None:
+                pack.cfg.add_config_line('io', io, overwrite=True)
+            tmc.all_RecordPackages.append(pack)
+        tmc.configure_packages(memoize=False, batch=batch)
+        configs[batch] = [pack.cfg.config for pack in tmc.all_RecordPackages]
+        counts = tmc.guess_rule_counts
+
+    assert configs[True] == configs[False]
+    assert counts['guess_common'] == 3
+
+
+def test_order_rules():
+    rules = [
+        GuessRule('a', reads=['x'], writes=['y']),
+        GuessRule('b', reads=['z'], writes=['x']),
+        GuessRule('c', reads=['q'], writes=['q']),
+    ]
+    assert [rule.method for rule in order_rules(rules)] == ['b', 'a', 'c']
+
+    rules.append(GuessRule('d', reads=['y'], writes=['z']))
+    with pytest.raises(RuleOrderError):
+        order_rules(rules)
+
+
+def test_BaseRecordPackage_guess_all_once(example_singular_tmc_chains):
+    record = BaseRecordPackage(example_singular_tmc_chains[0])
+    record.chain.last.tc_type = 'LREAL'
+    for idx, element in enumerate(record.chain.chain):
+        element.name = chr(97+idx)
+    record.generate_naive_config()
+    record.cfg = Configuration(config=[record.cfg.config[0]])
+    order = [rule.method for rule in record.ordered_guess_rules()]
+    assert order.index('guess_io') < order.index('guess_type')
+    assert order.index('guess_type') < order.index('guess_PREC')
+
+    fired = record.guess_all()
+    assert fired['guess_io'] == 1
+    assert fired['guess_type'] == 1
+    assert fired['guess_PREC'] == 1
+    assert record.guess_all() == {}
+
+
+def test_shared_templates(tmpdir):
+    template = get_template("asyn_standard_record.jinja2")
+    assert get_template("asyn_standard_record.jinja2") is template
+    assert BaseRecordPackage().record_template is template
+
+    use_template_cache(str(tmpdir))
+    try:
+        cached = get_template("asyn_standard_record.jinja2")
+        assert cached is not template
+        assert len(tmpdir.listdir()) == 1
+    finally:
+        use_template_cache(None)
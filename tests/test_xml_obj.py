@@ -1,11 +1,14 @@
 import pytest
 import logging
+import pickle
 
 import xml.etree.ElementTree as ET
 
 #from pytmc.xml_obj import Symbol, DataType
 from pytmc import Symbol, DataType, SubItem
 from pytmc.xml_obj import BaseElement, PvNotFrozenError, Configuration
+from pytmc.xml_obj import ConfigurationLayer, DetachedError
+from pytmc.xml_obj import _tokenize_pragma
 from collections import defaultdict
 
 logger = logging.getLogger(__name__)
@@ -361,6 +364,71 @@ def test_has_config(generic_tmc_root):
 
 
 
+def test_BaseElement_detach(string_tmc_root):
+    root = string_tmc_root
+    symbol_xml = root.find(
+        "./Modules/Module/DataAreas/DataArea/Symbol/[Name='MAIN.StringTest']"
+    )
+    symbol_element = Symbol(symbol_xml)
+    other_element = Symbol(symbol_xml)
+    symbol_element.detach()
+
+    assert symbol_element.element is None
+    assert symbol_element.name == 'MAIN.StringTest'
+    assert symbol_element.tc_type == 'STRING'
+    assert symbol_element.is_str
+    assert symbol_element.iterable_length == 55
+    assert symbol_element == symbol_element
+    assert symbol_element == other_element
+    assert symbol_element != Symbol(root.find(
+        "./Modules/Module/DataAreas/DataArea/Symbol/[Name='MAIN.count']"
+    ))
+    with pytest.raises(DetachedError):
+        symbol_element._get_raw_properties()
+    with pytest.raises(DetachedError):
+        symbol_element._get_subfield('Name')
+
+    empty_element = BaseElement(None)
+    assert empty_element._get_raw_properties() == []
+    assert empty_element._get_subfield('Name') is None
+    assert empty_element._get_subfield('Name', get_all=True) == []
+
+    datatype_xml = root.find("./DataTypes/DataType/[Name='DUT_ENUMTEST']")
+    datatype_element = DataType(datatype_xml)
+    datatype_element.detach()
+    assert datatype_element.is_enum
+    assert datatype_element.datatype == "Enum"
+
+
+def test_BaseElement_pickle(string_tmc_root):
+    root = string_tmc_root
+    symbol_xml = root.find(
+        "./Modules/Module/DataAreas/DataArea/Symbol/[Name='MAIN.StringTest']"
+    )
+    symbol_element = Symbol(symbol_xml)
+    other_element = Symbol(symbol_xml)
+    copy_element, copy_other = pickle.loads(
+        pickle.dumps((symbol_element, other_element))
+    )
+
+    assert symbol_element.element is symbol_xml
+    assert copy_element.element is None
+    assert copy_element.name == 'MAIN.StringTest'
+    assert copy_element.tc_type == 'STRING'
+    assert copy_element.iterable_length == 55
+    assert copy_element.raw_config == symbol_element.raw_config
+    assert copy_element == copy_element
+    assert copy_element == copy_other
+    assert copy_element != symbol_element
+
+    datatype_xml = root.find("./DataTypes/DataType/[Name='DUT_ENUMTEST']")
+    datatype_element = DataType(datatype_xml)
+    subitem_element = SubItem(ET.Element('SubItem'), parent=datatype_element)
+    copy_subitem = pickle.loads(pickle.dumps(subitem_element))
+    assert copy_subitem.parent.name == 'DUT_ENUMTEST'
+    assert copy_subitem.parent.children == [copy_subitem]
+
+
 def test_BaseElement_is_array(generic_tmc_root):
     root = generic_tmc_root
     
@@ -463,6 +531,22 @@ def test_Configuration_config_lines(leaf_bool_pragma_string_w_semicolon,
     assert result == test
 
 
+def test_tokenize_pragma():
+    raw = "\n  pv:A:B; io: i;;field: EGU   mm \r\n\t \n junk str: %d"
+    assert list(_tokenize_pragma(raw)) == [
+        ('pv:A', 'B'),
+        ('io', 'i'),
+        (';field', 'EGU   mm'),
+        ('str', '%d'),
+    ]
+    assert list(_tokenize_pragma("field: EGU   mm")) == [
+        ('field', ('EGU', 'mm')),
+    ]
+    assert list(_tokenize_pragma("field: EGU   mm", neaten=False)) == [
+        ('field', 'EGU   mm'),
+    ]
+
+
 def test_Configuration_neaten_field(leaf_bool_pragma_string):
     cfg = Configuration(leaf_bool_pragma_string)
     cfg_lines = cfg._config_lines()
@@ -493,6 +577,25 @@ def test_Configuration_formatted_config_lines(leaf_bool_pragma_string):
     ]
  
 
+def test_Configuration_parse_cache(leaf_bool_pragma_string):
+    Configuration.clear_parse_cache()
+    cfg_A = Configuration(leaf_bool_pragma_string)
+    cfg_B = Configuration(leaf_bool_pragma_string)
+    info = Configuration.parse_cache_info()
+    assert info.misses == 1
+    assert info.hits == 1
+
+    # Each Configuration gets its own copy of the parsed lines
+    assert cfg_A.config == cfg_B.config
+    cfg_A.config[2]['tag']['f_set'] = 'CHANGED'
+    cfg_A.add_config_line('pv', 'CHANGED', overwrite=True)
+    assert cfg_B.config[0] == {'title': 'pv', 'tag': 'TEST:MAIN:NEW_VAR_OUT'}
+    assert cfg_B.config[2]['tag'] == {'f_name': 'ZNAM', 'f_set': 'SINGLE'}
+
+    cfg_B.fix_to_config_name('TEST:MAIN:NEW_VAR_IN')
+    assert Configuration.parse_cache_info().hits == 2
+
+
 def test_Configuration_config_by_name(leaf_bool_pragma_string):
     cfg = Configuration(leaf_bool_pragma_string)
     result = cfg._config_by_name()
@@ -558,6 +661,25 @@ def test_Configuration_fix_to_config_name(leaf_bool_pragma_string):
     ]
 
 
+def test_Configuration_fix_to_config_name_repeated():
+    cfg = Configuration("""
+        pv: A
+        io: o
+        pv: B
+        pv: A
+        io: i
+    """)
+    cfg.fix_to_config_name('A')
+    assert cfg.config == [
+        {'title': 'pv', 'tag': 'A'},
+        {'title': 'io', 'tag': 'o'},
+    ]
+    assert cfg.config_names() == ['A']
+    cfg.fix_to_config_name('C')
+    assert cfg.config == []
+    assert cfg.config_names() == []
+
+
 def test_Configuration_add_config_line(branch_bool_pragma_string):
     cfg = Configuration(branch_bool_pragma_string)
     cfg.add_config_line('pv','THIRD')
@@ -597,6 +719,34 @@ def test_Configuration_get_config_lines(leaf_bool_pragma_string):
     ]
     
 
+def test_Configuration_index_updates(leaf_bool_pragma_string):
+    cfg = Configuration(leaf_bool_pragma_string)
+    assert len(cfg.get_config_fields('ZNAM')) == 2
+    cfg.add_config_field('ZNAM', 'OTHER')
+    cfg.add_config_line('io', 'io', line_no=0)
+    assert cfg.get_config_fields('ZNAM')[-1]['tag']['f_set'] == 'OTHER'
+    assert cfg.get_config_lines('io') == [
+        {'title': 'io', 'tag': 'io'},
+        {'title': 'io', 'tag': 'o'},
+        {'title': 'io', 'tag': 'i'},
+    ]
+
+    # Lists changed or replaced directly are indexed again
+    cfg.config.append({'title': 'io', 'tag': 'late'})
+    assert cfg.get_config_lines('io')[-1]['tag'] == 'late'
+    cfg.config = [{'title': 'field', 'tag': {'f_name': 'A', 'f_set': 'B'}}]
+    assert cfg.get_config_lines('io') == []
+    assert cfg.get_config_fields('A') == cfg.config
+    cfg.config[0] = {'title': 'field', 'tag': {'f_name': 'C', 'f_set': 'D'}}
+    assert cfg.get_config_fields('A') == []
+    assert cfg.get_config_fields('C') == cfg.config
+    cfg.add_config_line('io', 'io')
+    del cfg.config[0]
+    assert cfg.get_config_fields('C') == []
+    assert cfg.get_config_lines('io') == cfg.config
+    assert pickle.loads(pickle.dumps(cfg)).get_config_lines('io') == cfg.config
+
+
 def test_Configuration__eq__(leaf_bool_pragma_string):
     cfg_A = Configuration(leaf_bool_pragma_string)
     cfg_B = Configuration(leaf_bool_pragma_string)
@@ -623,6 +773,22 @@ def test_Configuration_concat(branch_connection_pragma_string,
     #assert False
 
 
+def test_Configuration_concat_fields():
+    outer = Configuration("pv: OUTER\nfield: DTYP asynInt32\nfield: EGU mm")
+    inner = Configuration("pv: INNER\nfield: EGU deg\nfield: PREC 3")
+    new_config = Configuration(config=[])
+    new_config.concat(outer)
+    new_config.concat(inner)
+    assert new_config.config == [
+        {'title': 'pv', 'tag': 'OUTER:INNER'},
+        {'title': 'field', 'tag': {'f_name': 'PREC', 'f_set': '3'}},
+    ]
+    assert new_config.get_config_fields('EGU') == []
+
+    layer = ConfigurationLayer.EMPTY.overlay(outer).overlay(inner)
+    assert layer.configuration().config == new_config.config
+
+
 def test_Configuration_seek():
     c = Configuration(config=[])
     c.add_config_line(title="pv",tag="ABC")